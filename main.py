@@ -10,10 +10,14 @@ from PIL import Image
 from copy import deepcopy
 from colorama import Fore, Style
 from src.game.base_game import BaseGame
+from src.game.othello.othello_game import OthelloGame
+from src.game.chess.eval_count_cache import shared_eval_count_cache
 from src.optimization.genetic_algorithm import GeneticAlgorithm
 from src.optimization.simulated_annealing import SimulatedAnnealing
 from src.optimization.pso import PSO
 from src.utility.utility import create_and_evaluate_game
+from src.utility.async_chess_extraction import warm_analysis_store
+from src.utility.position_sampler import PositionSampler
 
 def read_config(file_path="config.ini"):
     config = configparser.ConfigParser()
@@ -39,6 +43,24 @@ def main():
     game_name = config.get("Game", "name")
     algorithm_name = config.get("Algorithm", "name")
 
+    # Othello can tie its weights across the symmetries of the board
+    OthelloGame.SYMMETRIC = config.getboolean("Game", "symmetric", fallback=False)
+    # and rank late positions by their exact endgame score
+    OthelloGame.ENDGAME_EMPTIES = config.getint("Game", "endgame_empties", fallback=0)
+    # Chess evaluation counts are cached up to these limits
+    shared_eval_count_cache.set_limits(
+        max_entries=config.getint("Game", "eval_cache_entries", fallback=100_000) or None,
+        max_bytes=config.getint("Game", "eval_cache_bytes", fallback=0) or None,
+    )
+    # Processes the genetic algorithm evaluates its population on
+    num_workers = config.getint("Algorithm", "num_workers", fallback=1)
+    # evaluating it in chunks of a fixed size, so the results don't depend on the number of processes
+    chunk_size = config.getint("Algorithm", "chunk_size", fallback=5)
+    # A single run fitted to mini-batches of positions instead of a run per board
+    mini_batch = config.getboolean("Training", "mini_batch", fallback=False)
+    batch_size = config.getint("Training", "batch_size", fallback=16)
+    resample_every = config.getint("Training", "resample_every", fallback=10)
+
     # Use the choices in your project
     print(f"Selected Game: {game_name}")
     print(f"Selected Algorithm: {algorithm_name}")
@@ -52,27 +74,43 @@ def main():
         num_boards_to_fit = 50
         iterations = 500
         seed = 1
-        for game_num in range(num_boards_to_fit):
-            print(f"Evaluating: {game_num}")
-            print(f"Iterations {iterations}")
-
-            best_individual = None
-            if algorithm_name == "genetic_algorithm":
-                # Create a GeneticAlgorithm instance
-                genetic_algorithm = GeneticAlgorithm(game_name, population_size=20, mutation_rate=0.8, seed=seed)
-
-                # Evolve the population for a certain number of generations
-                best_individual = genetic_algorithm.evolve(generations=100)
-            elif algorithm_name == "pso":
-                pso = PSO(game_name, num_particles=10, seed=seed)
-                # Evolve the population for a certain number of generations
-                best_individual = pso.iterate(iterations=iterations)
-            elif algorithm_name == "simulated_annealing":
+        num_evaluations = 100 #Number of times the weights are evaluated on different board states.
+        if mini_batch:
+            # The training positions start after the chess evaluation positions
+            with PositionSampler(game_name, seed=seed + num_evaluations, batch_size=batch_size) as sampler:
+                best_individual = None
+                if algorithm_name == "genetic_algorithm":
+                    genetic_algorithm = GeneticAlgorithm(game_name, population_size=20, mutation_rate=0.8, num_workers=num_workers, chunk_size=chunk_size, sampler=sampler, resample_every=resample_every)
+                    best_individual = genetic_algorithm.evolve(generations=100)
+                elif algorithm_name == "pso":
+                    pso = PSO(game_name, num_particles=10, sampler=sampler, resample_every=resample_every)
+                    best_individual = pso.iterate(iterations=iterations)
+                elif algorithm_name == "simulated_annealing":
+                    simulated_annealing = SimulatedAnnealing(game_name, temperature=1, sampler=sampler, resample_every=resample_every)
+                    best_individual = simulated_annealing.iterate(iterations_per_temp=5)
+            weights_list.append(list(best_individual.get_weights()))
+        else:
+            for game_num in range(num_boards_to_fit):
+                print(f"Evaluating: {game_num}")
+                print(f"Iterations {iterations}")
+
+                best_individual = None
+                if algorithm_name == "genetic_algorithm":
+                    # Create a GeneticAlgorithm instance
+                    genetic_algorithm = GeneticAlgorithm(game_name, population_size=20, mutation_rate=0.8, seed=seed, num_workers=num_workers, chunk_size=chunk_size)
+
+                    # Evolve the population for a certain number of generations
+                    best_individual = genetic_algorithm.evolve(generations=100)
+                elif algorithm_name == "pso":
+                    pso = PSO(game_name, num_particles=10, seed=seed)
+                    # Evolve the population for a certain number of generations
+                    best_individual = pso.iterate(iterations=iterations)
+                elif algorithm_name == "simulated_annealing":
                 
-                simulated_annealing = SimulatedAnnealing(game_name, temperature=1, seed=seed)
-                best_individual = simulated_annealing.iterate(iterations_per_temp=5)
+                    simulated_annealing = SimulatedAnnealing(game_name, temperature=1, seed=seed)
+                    best_individual = simulated_annealing.iterate(iterations_per_temp=5)
                 
-            weights_list.append(best_individual.get_weights())
+                weights_list.append(best_individual.get_weights())
         
         # Combine weights by averaging them out.
         combined_weights = deepcopy(weights_list[0])
@@ -80,7 +118,9 @@ def main():
             combined_weights[weight_idx] = sum([weights_list[i][weight_idx] for i in range(len(weights_list))])/len(weights_list)
         
         evaluations = []
-        num_evaluations = 100 #Number of times the weights are evaluated on different board states.
+        if game_name == "chess":
+            # Label every evaluation position concurrently up front, the evaluations then read them from the analysis store
+            warm_analysis_store(range(seed, seed + num_evaluations))
         # Perform evaluations
         for evaluation in range(num_evaluations): 
             fitness_score, best_move, index, num_moves = create_and_evaluate_game(game_name, combined_weights, evaluation+seed)
@@ -101,7 +141,7 @@ def main():
         for particles in [5,10,20]:
             if algorithm_name == "genetic_algorithm":
                 # Create a GeneticAlgorithm instance
-                genetic_algorithm = GeneticAlgorithm(game_name, population_size=20, mutation_rate=0.8, seed=seed)
+                genetic_algorithm = GeneticAlgorithm(game_name, population_size=20, mutation_rate=0.8, seed=seed, num_workers=num_workers, chunk_size=chunk_size)
 
                 # Evolve the population for a certain number of generations
                 best_individual = genetic_algorithm.evolve(generations=2000)
@@ -138,7 +178,7 @@ def main():
         best_individual = None
         if algorithm_name == "genetic_algorithm":
             # Create a GeneticAlgorithm instance
-            genetic_algorithm = GeneticAlgorithm(game_name, population_size=20, mutation_rate=0.8, seed=seed)
+            genetic_algorithm = GeneticAlgorithm(game_name, population_size=20, mutation_rate=0.8, seed=seed, num_workers=num_workers, chunk_size=chunk_size)
 
             # Evolve the population for a certain number of generations
             best_individual = genetic_algorithm.evolve(generations=2000)
@@ -21,6 +21,30 @@ class BaseGame(ABC):
     def fitness(self):
         pass
 
+    @abstractmethod
+    def fitness_batch(self, weights):
+        """Evaluate a (P, D) matrix of weights on this board in one call.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray, np.ndarray]: Fitness, best move index (into
+            get_legal_moves(), -1 if there are no moves) and best score for each row.
+        """
+        pass
+
+    def evaluation_context(self):
+        """Object with the same fitness_batch as the game, sent to worker processes instead of the game.
+        Games that hold more than fitness_batch needs return something smaller."""
+        return self
+
+    @abstractmethod
+    def position_key(self):
+        """Hashable key of everything other than the weights that the fitness depends on."""
+        pass
+
+    @abstractmethod
+    def get_legal_moves(self):
+        pass
+
     @abstractmethod
     def get_weights(self):
         pass
@@ -1,7 +1,9 @@
 # src/game/chess.py
 import chess
+import chess.polyglot
 from chess import svg
 import random
+import numpy as np
 from src.game.base_game import BaseGame
 
 from src.game.chess.evaluations.queen import QueenEvaluator, queen_weight_bounds, queen_weight_labels
@@ -10,11 +12,52 @@ from src.game.chess.evaluations.knight import KnightEvaluator, knight_weight_bou
 from src.game.chess.evaluations.pawn import PawnEvaluator, pawn_weight_bounds, pawn_weight_labels
 from src.game.chess.evaluations.bishop import BishopEvaluator, bishop_weight_bounds, bishop_weight_labels
 from src.game.chess.evaluations.king import KingEvaluator, king_weight_bounds, king_weight_labels
+from src.game.chess.evaluations.bitboard import BitboardEvaluator, IncrementalBitboardEvaluator
+from src.game.chess.eval_count_cache import shared_eval_count_cache
+
+
+def best_move_index(evaluated_scores, white_to_move):
+    # White picks the highest evaluation and black the lowest
+    if white_to_move:
+        return np.argmax(evaluated_scores, axis=-1)
+    return np.argmin(evaluated_scores, axis=-1)
+
+
+class ChessEvaluationContext:
+    """The part of a ChessGame that fitness_batch needs, small enough to send to other processes."""
+
+    def __init__(self, move_features, target_scores, move_ranks, white_to_move):
+        self.move_features = move_features
+        self.target_scores = target_scores
+        self.move_ranks = move_ranks
+        self.white_to_move = white_to_move
+
+    def fitness_batch(self, weights):
+        # (P, M) evaluated score of every legal move for every set of weights
+        evaluated_scores = np.asarray(weights, dtype=float) @ self.move_features.T
+        best_move_indices = best_move_index(evaluated_scores, self.white_to_move)
+        best_scores = np.take_along_axis(evaluated_scores, best_move_indices[:, None], axis=1)[:, 0]
+
+        scores = -np.sum(np.abs(evaluated_scores - self.target_scores), axis=1)
+
+        # Interpolate the score based on its rank
+        ranks = self.move_ranks[best_move_indices]
+        # https://www.desmos.com/calculator/4envqidilb
+        num_moves = len(self.move_features)
+        scores += (num_moves / ranks - 8) * 10
+
+        return (scores / num_moves, best_move_indices, best_scores)
 
 
 class ChessGame(BaseGame):
+    # "bitboard" computes the evaluation counts from python-chess masks,
+    # "square" walks the board with the per-piece evaluators
+    EVALUATION_BACKEND = "bitboard"
+
     def __init__(self, meta):
-        board, game_moves, move_sequences, ranked_moves, eval_count_cache = meta
+        board, game_moves, move_sequences, ranked_moves, eval_count_cache = meta[:5]
+        # Games created from another game's board data reuse its precomputed move features
+        move_features = meta[5] if len(meta) > 5 else None
 
         self.board = board
         self.game_moves = game_moves
@@ -28,33 +71,43 @@ class ChessGame(BaseGame):
 
         self.initialize_random_weights()
 
-        self.eval_count_cache = eval_count_cache
-        self.eval_count_from_cache(self.board)
+        self.eval_count_cache = eval_count_cache if eval_count_cache is not None else shared_eval_count_cache
+        self.legal_moves = list(self.board.legal_moves)
+
+        # The score of a move is linear in the weights, so the (final - initial) feature counts
+        # for every legal move only need to be computed once per board
+        if move_features is None:
+            move_features = self.compute_move_features()
+        self.move_features = move_features
+        # Stockfish score and rank for each legal move, in the same order as the feature rows
+        self.target_scores = np.array([self.move_sequences[str(move)]['score'].relative.score(mate_score=2000) for move in self.legal_moves], dtype=float)
+        self.move_ranks = np.array([self.ranked_moves[str(move)] for move in self.legal_moves], dtype=float)
+
+    def __getstate__(self):
+        # The shared evaluation count cache belongs to the process, copies of the game use the one where they are loaded
+        state = self.__dict__.copy()
+        if state["eval_count_cache"] is shared_eval_count_cache:
+            state["eval_count_cache"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.eval_count_cache is None:
+            self.eval_count_cache = shared_eval_count_cache
 
     # Random starting genes for the chromosome based on lower and upper bounds
     def initialize_random_weights(self):
-        self.weight_for_eval_counts = [
-            [random.uniform(float(lower), float(upper)) for lower, upper in queen_weight_bounds],
-            [random.uniform(float(lower), float(upper)) for lower, upper in rook_weight_bounds],
-            [random.uniform(float(lower), float(upper)) for lower, upper in knight_weight_bounds],
-            [random.uniform(float(lower), float(upper)) for lower, upper in bishop_weight_bounds],
-            [random.uniform(float(lower), float(upper)) for lower, upper in king_weight_bounds],
-            [random.uniform(float(lower), float(upper)) for lower, upper in pawn_weight_bounds],
-        ]
+        weight_bounds = [queen_weight_bounds, rook_weight_bounds, knight_weight_bounds, bishop_weight_bounds, king_weight_bounds, pawn_weight_bounds]
+        self.weights = np.array([random.uniform(float(lower), float(upper)) for bounds in weight_bounds for lower, upper in bounds])
 
     def get_board_data(self):
-        return [self.board, self.game_moves, self.move_sequences, self.ranked_moves, self.eval_count_cache]
+        return [self.board, self.game_moves, self.move_sequences, self.ranked_moves, self.eval_count_cache, self.move_features]
 
     def rank_move(self, move):
-        return (self.ranked_moves[str(move)], len(list(self.board.legal_moves)))
+        return (self.ranked_moves[str(move)], len(self.legal_moves))
 
     def get_weights(self):
-        # concatenate all the weights into a single list
-        concatenated_weights = []
-        for sublist in self.weight_for_eval_counts:
-            concatenated_weights.extend(sublist)
-
-        return concatenated_weights
+        return self.weights.tolist()
 
     def get_weight_bounds(self):
         return queen_weight_bounds + rook_weight_bounds + knight_weight_bounds + bishop_weight_bounds + king_weight_bounds + pawn_weight_bounds
@@ -63,21 +116,24 @@ class ChessGame(BaseGame):
         return queen_weight_labels + rook_weight_labels + knight_weight_labels + bishop_weight_labels + king_weight_labels + pawn_weight_labels
     
     def update_weights(self, weights):
-        queen_weights = weights[:len(queen_weight_bounds)]
-        rook_weights = weights[len(queen_weight_bounds):len(queen_weight_bounds) + len(rook_weight_bounds)]
-        knight_weights = weights[len(queen_weight_bounds) + len(rook_weight_bounds):len(queen_weight_bounds) + len(rook_weight_bounds) + len(knight_weight_bounds)]
-        bishop_weights = weights[len(queen_weight_bounds) + len(rook_weight_bounds) + len(knight_weight_bounds):len(queen_weight_bounds) + len(rook_weight_bounds) + len(knight_weight_bounds) + len(bishop_weight_bounds)]
-        king_weights = weights[len(queen_weight_bounds) + len(rook_weight_bounds) + len(knight_weight_bounds) + len(bishop_weight_bounds):len(queen_weight_bounds) + len(rook_weight_bounds) + len(knight_weight_bounds) + len(bishop_weight_bounds) + len(king_weight_bounds)]
-        pawn_weights = weights[len(queen_weight_bounds) + len(rook_weight_bounds) + len(knight_weight_bounds) + len(bishop_weight_bounds) + len(king_weight_bounds):]
-
-        self.weight_for_eval_counts = [queen_weights, rook_weights, knight_weights, bishop_weights, king_weights, pawn_weights]
+        self.weights = np.array(weights, dtype=float)
     
     def eval_count_from_cache(self, board):
-        if self.eval_count_cache.get(str(board)) is not None:
-            return self.eval_count_cache.get(str(board))
-
-        
+        eval_count_for_weight = self.eval_count_cache.get(board)
+        if eval_count_for_weight is not None:
+            return eval_count_for_weight
+
+        if self.EVALUATION_BACKEND == "bitboard":
+            scores_for_weights = BitboardEvaluator(board).get_scores_for_weights()
+        else:
+            scores_for_weights = self.square_eval_counts(board)
+
+        # Keep the [white, black] count of every weight as one compact (num weights, 2) array
+        eval_count_for_weight = np.array([evals for eval_counts in scores_for_weights for evals in eval_counts], dtype=np.int16)
+        self.eval_count_cache.put(board, eval_count_for_weight)
+        return eval_count_for_weight
 
+    def square_eval_counts(self, board):
         # Instantiate the evaluators and update their scores for each square in the board
         # At the end, the score will be the sum of all the evaluations
         queen_evaluator = QueenEvaluator(board)
@@ -108,102 +164,91 @@ class ChessGame(BaseGame):
         king_scores_for_weights = king_evaluator.get_scores_for_weights()
         pawn_scores_for_weights = pawn_evaluator.get_scores_for_weights()
 
-        eval_count_for_weight = [queen_scores_for_weights, rook_scores_for_weights, knight_scores_for_weights, bishop_scores_for_weights, king_scores_for_weights, pawn_scores_for_weights]
-
-        self.eval_count_cache[str(board)] = eval_count_for_weight
-        return eval_count_for_weight
+        return [queen_scores_for_weights, rook_scores_for_weights, knight_scores_for_weights, bishop_scores_for_weights, king_scores_for_weights, pawn_scores_for_weights]
+
+    def feature_counts(self, board):
+        # Collapse the [white, black] count of every weight into a single (white - black) vector
+        eval_count_for_weight = self.eval_count_from_cache(board).astype(float)
+        return eval_count_for_weight[:, 0] - eval_count_for_weight[:, 1]
+
+    def incremental_feature_counts(self, board, incremental_evaluator):
+        # Same as feature_counts but only recomputes the pieces that changed since the root position
+        eval_count_for_weight = self.eval_count_cache.get(board)
+        if eval_count_for_weight is None:
+            eval_count_for_weight = np.array(incremental_evaluator.get_scores_for_weights(board), dtype=np.int16)
+            self.eval_count_cache.put(board, eval_count_for_weight)
+
+        eval_count_for_weight = eval_count_for_weight.astype(float)
+        return eval_count_for_weight[:, 0] - eval_count_for_weight[:, 1]
+
+    def compute_move_features(self):
+        # The root counts are computed once and shared by the final position of every principal variation
+        if self.EVALUATION_BACKEND == "bitboard":
+            incremental_evaluator = IncrementalBitboardEvaluator(self.board)
+            initial_features = self.incremental_feature_counts(self.board, incremental_evaluator)
+        else:
+            incremental_evaluator = None
+            initial_features = self.feature_counts(self.board)
+
+        move_features = np.empty((len(self.legal_moves), len(initial_features)))
+        for idx, move in enumerate(self.legal_moves):
+            # Push the desired moves and then also the move that stockfish would make in retaliation,
+            # then take them back so the board is left as it was
+            pushed_moves = 0
+            try:
+                for next_move in self.move_sequences[str(move)]['next_moves']:
+                    self.board.push(next_move)
+                    pushed_moves += 1
+
+                if incremental_evaluator is not None:
+                    final_features = self.incremental_feature_counts(self.board, incremental_evaluator)
+                else:
+                    final_features = self.feature_counts(self.board)
+            finally:
+                for _ in range(pushed_moves):
+                    self.board.pop()
+
+            move_features[idx] = final_features - initial_features
+
+        return move_features
 
     def score_board_state(self, board, debug=False):
-        eval_count_for_weight = self.eval_count_from_cache(board)
-        labels = self.get_weight_labels()
-
-        white_score = 0
-        black_score = 0
-        # Sum the scores for each weight
-        idx = 0
-        for piece_type, eval_counts in enumerate(eval_count_for_weight):
-            piece_weights = self.weight_for_eval_counts[piece_type]
-
-            for weight_idx, evals in enumerate(eval_counts):
-                weight = piece_weights[weight_idx]
-
-                white_score += weight * evals[0]
-                black_score += weight * evals[1]
+        features = self.feature_counts(board)
 
-                if debug:
-                    print(f"Label: {labels[idx]}      White: {evals[0]}     Black: {evals[1]}")
-                idx += 1
         if debug:
-            print(f"White Score {white_score}")
-            print(f"Black Score {black_score}\n\n\n")
-        return white_score - black_score
+            evals = self.eval_count_from_cache(board)
+            labels = self.get_weight_labels()
+            for idx, label in enumerate(labels):
+                print(f"Label: {label}      White: {evals[idx][0]}     Black: {evals[idx][1]}")
+            print(f"Score {features @ self.weights}\n\n\n")
+        return features @ self.weights
 
     def evaluate_move(self, move):
-        new_board = self.board.copy()
+        return self.move_features[self.legal_moves.index(move)] @ self.weights
 
-        debug = False
-        if debug:
-            print("INITIAL!")
-        initial_score = self.score_board_state(new_board, debug)
-
-        # Push the desired moves and then also the move that stockfish would make in retaliation
-        for next_move in self.move_sequences[str(move)]['next_moves']:
-            new_board.push(chess.Move.from_uci(next_move.uci()))
-    
-        if debug:
-            print("FINAL!")
-        final_score = self.score_board_state(new_board, debug)
-        return final_score - initial_score
+    def best_move_index(self, evaluated_scores):
+        return best_move_index(evaluated_scores, self.board.turn == chess.WHITE)
     
     # Fitness is defined as the average difference between the actual stockfish score and the evaluated score
     def fitness(self):
-        score = 0
-        legal_moves = list(self.board.legal_moves)
-        
-        best_move = best_score = None
-        
-        for move in legal_moves:
-            # Score from the perspective of whose turn it is (from stockfish)
-            actual_score = 0
-
-            # Keep track of the best move and score
-            evaluated_score = self.evaluate_move(move)
-            if best_score is None:
-                best_score = evaluated_score
-                best_move = move
-            elif self.board.turn == chess.WHITE and evaluated_score > best_score:
-                best_score = evaluated_score
-                best_move = move
-            elif self.board.turn == chess.BLACK and evaluated_score < best_score:
-                best_score = evaluated_score
-                best_move = move
-
-            actual_score = self.move_sequences[str(move)]['score'].relative.score(mate_score=2000)
-            score -= abs(evaluated_score - actual_score)
-        
-        # Interpolate the score based on its rank
-        rank = self.ranked_moves[str(best_move)]
-        # https://www.desmos.com/calculator/4envqidilb
-        score += (len(legal_moves) / rank - 8) * 10
-
+        fitness_scores, best_move_indices, best_scores = self.fitness_batch(self.weights.reshape(1, -1))
         #print(f"TURN: {self.turn}, Chosen Move: {best_move} With Score: {best_score}\nGM Move: {self.gm_move} Stockfish Move: {self.stockfish_move}, With Stockfish Evaluation: {self.stockfish_score}\n\n")
-        return (score / len(legal_moves), best_move, best_score)
+        return (float(fitness_scores[0]), self.legal_moves[best_move_indices[0]], float(best_scores[0]))
+
+    def fitness_batch(self, weights):
+        return self.evaluation_context().fitness_batch(weights)
+
+    def evaluation_context(self):
+        return ChessEvaluationContext(self.move_features, self.target_scores, self.move_ranks, self.board.turn == chess.WHITE)
+
+    def get_legal_moves(self):
+        return self.legal_moves
+
+    def position_key(self):
+        return chess.polyglot.zobrist_hash(self.board)
 
     def get_best_move(self):
-        best_score = None
-        legal_moves = list(self.board.legal_moves)
-        for move in legal_moves:
-            evaluated_score = self.evaluate_move(move)
-            if best_score is None:
-                best_score = evaluated_score
-                best_move = move
-            elif self.board.turn == chess.WHITE and evaluated_score > best_score:
-                best_score = evaluated_score
-                best_move = move
-            elif self.board.turn == chess.BLACK and evaluated_score < best_score:
-                best_score = evaluated_score
-                best_move = move            
-        return best_move
+        return self.legal_moves[int(self.best_move_index(self.move_features @ self.weights))]
 
     def visualize_best_move(self, img_size):
         best_move = self.get_best_move()
@@ -0,0 +1,77 @@
+import sys
+from collections import OrderedDict
+
+import chess
+import chess.polyglot
+
+
+class EvalCountCache:
+    """Bounded LRU cache of evaluation counts keyed by the Zobrist hash of the board.
+
+    Unlike str(board), the Zobrist hash includes the side to move, castling rights and the
+    en passant square. Once either limit is reached the least recently used entries are evicted.
+    """
+
+    def __init__(self, max_entries=100_000, max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, board: chess.Board):
+        return chess.polyglot.zobrist_hash(board)
+
+    def get(self, board: chess.Board):
+        key = self.key(board)
+        counts = self.entries.get(key)
+        if counts is None:
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return counts
+
+    def put(self, board: chess.Board, counts):
+        key = self.key(board)
+        if key in self.entries:
+            self.nbytes -= sys.getsizeof(self.entries.pop(key))
+
+        self.entries[key] = counts
+        self.nbytes += sys.getsizeof(counts)
+        self.evict()
+
+    def set_limits(self, max_entries=100_000, max_bytes=None):
+        """Change the limits, a limit of None is off."""
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.evict()
+
+    def evict(self):
+        # Evict the least recently used entries until we're back under the limits
+        while self.entries and (
+            (self.max_entries is not None and len(self.entries) > self.max_entries)
+            or (self.max_bytes is not None and self.nbytes > self.max_bytes)
+        ):
+            _, evicted_counts = self.entries.popitem(last=False)
+            self.nbytes -= sys.getsizeof(evicted_counts)
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+
+    def clear(self):
+        self.entries.clear()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+
+# Shared by every chess position so repeated positions are only evaluated once per process
+shared_eval_count_cache = EvalCountCache()
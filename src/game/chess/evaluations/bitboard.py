@@ -0,0 +1,400 @@
+import chess
+
+from src.game.chess.evaluations.queen import queen_weight_bounds
+from src.game.chess.evaluations.rook import rook_weight_bounds
+from src.game.chess.evaluations.knight import knight_weight_bounds, WHITE_POSITION_MAPPING, BLACK_POSITION_MAPPING
+from src.game.chess.evaluations.bishop import bishop_weight_bounds
+from src.game.chess.evaluations.king import king_weight_bounds
+from src.game.chess.evaluations.pawn import pawn_weight_bounds
+
+WHITE_SCORE_IDX = 0
+BLACK_SCORE_IDX = 1
+
+# Offset of each evaluator's weights in the flat weight vector (same order as ChessGame.get_weights)
+EVALUATOR_WEIGHT_COUNTS = [
+    len(queen_weight_bounds),
+    len(rook_weight_bounds),
+    len(knight_weight_bounds),
+    len(bishop_weight_bounds),
+    len(king_weight_bounds),
+    len(pawn_weight_bounds),
+]
+QUEEN_OFFSET = 0
+ROOK_OFFSET = QUEEN_OFFSET + len(queen_weight_bounds)
+KNIGHT_OFFSET = ROOK_OFFSET + len(rook_weight_bounds)
+BISHOP_OFFSET = KNIGHT_OFFSET + len(knight_weight_bounds)
+KING_OFFSET = BISHOP_OFFSET + len(bishop_weight_bounds)
+PAWN_OFFSET = KING_OFFSET + len(king_weight_bounds)
+NUM_WEIGHTS = PAWN_OFFSET + len(pawn_weight_bounds)
+
+KNIGHT_POSITION_VALUES = {
+    chess.WHITE: [WHITE_POSITION_MAPPING[chess.square_name(square)] for square in chess.SQUARES],
+    chess.BLACK: [BLACK_POSITION_MAPPING[chess.square_name(square)] for square in chess.SQUARES],
+}
+
+# The squares each color's pawns have to be on to support a knight. This mirrors the square arithmetic
+# of KnightEvaluator.is_knight_supported_by_pawn, which wraps around the a and h files.
+def _knight_support_mask(square, color):
+    rank = chess.square_rank(square) + (1 if color == chess.WHITE else -1)
+    file = chess.square_file(square)
+    mask = 0
+    for adjacent_square in (rank * 8 + file - 1, rank * 8 + file + 1):
+        if 0 <= adjacent_square <= 63:
+            mask |= chess.BB_SQUARES[adjacent_square]
+    return mask
+
+KNIGHT_SUPPORT_MASKS = {color: [_knight_support_mask(square, color) for square in chess.SQUARES] for color in chess.COLORS}
+
+# Files a pawn has to look at to decide if it is passed (its own file and both neighbours)
+ADJACENT_FILES_MASKS = [
+    chess.BB_FILES[file] | (chess.BB_FILES[file - 1] if file > 0 else 0) | (chess.BB_FILES[file + 1] if file < 7 else 0)
+    for file in range(8)
+]
+
+# Squares on a file in front of a pawn, from the perspective of each color
+FILE_AHEAD_MASKS = {
+    chess.WHITE: [chess.BB_FILES[chess.square_file(square)] & ~((1 << ((chess.square_rank(square) + 1) * 8)) - 1) for square in chess.SQUARES],
+    chess.BLACK: [chess.BB_FILES[chess.square_file(square)] & ((1 << (chess.square_rank(square) * 8)) - 1) for square in chess.SQUARES],
+}
+
+# The half of the board each player's pawns protect
+PLAYER_AREA_MASKS = {
+    chess.WHITE: chess.BB_RANK_1 | chess.BB_RANK_2 | chess.BB_RANK_3 | chess.BB_RANK_4,
+    chess.BLACK: chess.BB_RANK_5 | chess.BB_RANK_6 | chess.BB_RANK_7 | chess.BB_RANK_8,
+}
+
+# (from, to) pairs that KingEvaluator.has_castled treats as castling for each color
+CASTLING_MOVES = {
+    chess.WHITE: {(chess.E1, chess.G1), (chess.E1, chess.C1), (chess.E8, chess.G8), (chess.E8, chess.C8)},
+    chess.BLACK: {(chess.E8, chess.G8), (chess.E8, chess.C8)},
+}
+
+
+class BitboardEvaluator:
+    """Computes the same per-weight [white, black] counts as the six square based evaluators
+    using python-chess integer masks instead of square names."""
+
+    def __init__(self, board: chess.Board, count_pieces=True):
+        self.board = board
+
+        self.pawns = {color: board.pieces_mask(chess.PAWN, color) for color in chess.COLORS}
+        self.rooks = {color: board.pieces_mask(chess.ROOK, color) for color in chess.COLORS}
+        self.bishop_counts = {color: chess.popcount(board.pieces_mask(chess.BISHOP, color)) for color in chess.COLORS}
+
+        # The squares around each king
+        self.king_zones = {}
+        for color in chess.COLORS:
+            king = board.king(color)
+            self.king_zones[color] = chess.BB_KING_ATTACKS[king] if king is not None else 0
+
+        castling_moves = {(move.from_square, move.to_square) for move in board.move_stack if move.promotion is None}
+        self.has_castled = {color: not castling_moves.isdisjoint(CASTLING_MOVES[color]) for color in chess.COLORS}
+
+        self.pawn_moves = {color: self.count_legal_pawn_moves(color) for color in chess.COLORS}
+
+        # (W, B) scores for each weight
+        self.scores_for_weights = [[0.0, 0.0] for _ in range(NUM_WEIGHTS)]
+        if not count_pieces:
+            # Only the board context is needed (IncrementalBitboardEvaluator counts pieces itself)
+            return
+
+        for square, piece_type, color in self.pieces():
+            color_idx = WHITE_SCORE_IDX if color == chess.WHITE else BLACK_SCORE_IDX
+            for weight_idx, count in self.counts_for_square(square, piece_type, color):
+                self.scores_for_weights[weight_idx][color_idx] += count
+
+    def get_scores_for_weights(self):
+        # Split the flat counts back up by evaluator (queen, rook, knight, bishop, king, pawn)
+        scores_for_weights = []
+        offset = 0
+        for weight_count in EVALUATOR_WEIGHT_COUNTS:
+            scores_for_weights.append(self.scores_for_weights[offset:offset + weight_count])
+            offset += weight_count
+        return scores_for_weights
+
+    def pieces(self):
+        for color in chess.COLORS:
+            for piece_type in chess.PIECE_TYPES:
+                for square in chess.scan_forward(self.board.pieces_mask(piece_type, color)):
+                    yield square, piece_type, color
+
+    def piece_attacks(self, square, piece_type, color):
+        """The attack mask the counts of a piece are based on (kings don't use one)."""
+        if piece_type == chess.PAWN:
+            return chess.BB_PAWN_ATTACKS[color][square]
+        elif piece_type == chess.KNIGHT:
+            return chess.BB_KNIGHT_ATTACKS[square]
+        elif piece_type == chess.KING:
+            return 0
+        return self.board.attacks_mask(square)
+
+    def counts_for_square(self, square, piece_type, color):
+        """Returns the (weight index, count) pairs that the piece on the square adds for its color."""
+        if piece_type == chess.PAWN:
+            return self.pawn_counts(square, color)
+        elif piece_type == chess.KNIGHT:
+            return self.knight_counts(square, color)
+        elif piece_type == chess.BISHOP:
+            return self.bishop_counts_for_square(square, color)
+        elif piece_type == chess.ROOK:
+            return self.rook_counts(square, color)
+        elif piece_type == chess.QUEEN:
+            return self.queen_counts(square, color)
+        return self.king_counts(color)
+
+    def king_attack_counts(self, attacks, color, attacking_idx, defending_idx):
+        return [
+            (attacking_idx, chess.popcount(attacks & self.king_zones[not color])),
+            (defending_idx, chess.popcount(attacks & self.king_zones[color])),
+        ]
+
+    def queen_counts(self, square, color):
+        attacks = self.board.attacks_mask(square)
+        return [
+            (QUEEN_OFFSET, 1),
+            *self.king_attack_counts(attacks, color, QUEEN_OFFSET + 1, QUEEN_OFFSET + 2),
+            (QUEEN_OFFSET + 3, chess.popcount(attacks)),
+        ]
+
+    def rook_counts(self, square, color):
+        attacks = self.board.attacks_mask(square)
+        counts = [
+            (ROOK_OFFSET, 1),
+            *self.king_attack_counts(attacks, color, ROOK_OFFSET + 1, ROOK_OFFSET + 2),
+            (ROOK_OFFSET + 3, chess.popcount(attacks)),
+        ]
+
+        # Rooks on the seventh rank
+        if chess.square_rank(square) == (6 if color == chess.WHITE else 1):
+            counts.append((ROOK_OFFSET + 4, 1))
+
+        file_mask = chess.BB_FILES[chess.square_file(square)]
+        ally_pawns = self.pawns[color] & file_mask
+        enemy_pawns = self.pawns[not color] & file_mask
+        if not ally_pawns and not enemy_pawns:
+            counts.append((ROOK_OFFSET + 5, 1))
+        if not ally_pawns:
+            counts.append((ROOK_OFFSET + 6, 1))
+        if ally_pawns and enemy_pawns:
+            counts.append((ROOK_OFFSET + 7, -1))
+
+        # Connected to another rook of the same color
+        if attacks & self.rooks[color]:
+            counts.append((ROOK_OFFSET + 8, 1))
+        return counts
+
+    def knight_counts(self, square, color):
+        attacks = chess.BB_KNIGHT_ATTACKS[square]
+        counts = [
+            (KNIGHT_OFFSET, 1),
+            (KNIGHT_OFFSET + 1, KNIGHT_POSITION_VALUES[color][square]),
+            *self.king_attack_counts(attacks, color, KNIGHT_OFFSET + 2, KNIGHT_OFFSET + 3),
+            (KNIGHT_OFFSET + 4, chess.popcount(attacks)),
+        ]
+        if KNIGHT_SUPPORT_MASKS[color][square] & self.pawns[color]:
+            counts.append((KNIGHT_OFFSET + 5, 1))
+        return counts
+
+    def bishop_counts_for_square(self, square, color):
+        attacks = self.board.attacks_mask(square)
+        counts = [
+            (BISHOP_OFFSET, 1),
+            *self.king_attack_counts(attacks, color, BISHOP_OFFSET + 1, BISHOP_OFFSET + 2),
+            (BISHOP_OFFSET + 3, chess.popcount(attacks)),
+        ]
+        if self.bishop_counts[color] >= 2:
+            counts.append((BISHOP_OFFSET + 4, 1))
+        return counts
+
+    def king_counts(self, color):
+        castling_rights = int(self.board.has_kingside_castling_rights(color)) + int(self.board.has_queenside_castling_rights(color))
+        counts = [(KING_OFFSET, 1), (KING_OFFSET + 1, castling_rights)]
+        if self.has_castled[color]:
+            counts.append((KING_OFFSET + 2, 1))
+        return counts
+
+    def pawn_counts(self, square, color):
+        square_mask = chess.BB_SQUARES[square]
+        file = chess.square_file(square)
+        attacks = chess.BB_PAWN_ATTACKS[color][square]
+        legal_moves = self.pawn_moves[color].get(square, 0)
+
+        is_double_pawn = self.pawns[color] & chess.BB_FILES[file] & ~square_mask
+        is_passed_pawn = not self.pawns[not color] & ADJACENT_FILES_MASKS[file]
+        is_central_pawn = square_mask & chess.BB_CENTER
+
+        counts = [
+            (PAWN_OFFSET, 1),
+            *self.king_attack_counts(attacks, color, PAWN_OFFSET + 5, PAWN_OFFSET + 6),
+            (PAWN_OFFSET + 7, legal_moves),
+        ]
+
+        if legal_moves == 0:
+            counts.append((PAWN_OFFSET + 8, -1))
+            if is_passed_pawn:
+                counts.append((PAWN_OFFSET + 9, -1))
+            if is_central_pawn:
+                counts.append((PAWN_OFFSET + 10, -1))
+
+        if is_central_pawn:
+            counts.append((PAWN_OFFSET + 1, 1))
+
+        if is_double_pawn:
+            counts.append((PAWN_OFFSET + 2, -1))
+
+        if is_passed_pawn:
+            rank = chess.square_rank(square)
+            counts.append((PAWN_OFFSET + 4, rank if color == chess.WHITE else 7 - rank))
+
+            protecting_rooks = chess.popcount(self.rooks[color] & FILE_AHEAD_MASKS[color][square])
+            if protecting_rooks > 0:
+                counts.append((PAWN_OFFSET + 12, protecting_rooks))
+
+        # Isolated pawns have no friendly pawn on any of the surrounding squares
+        if not chess.BB_KING_ATTACKS[square] & self.pawns[color]:
+            counts.append((PAWN_OFFSET + 3, -1))
+
+        protected_squares = chess.popcount(attacks & PLAYER_AREA_MASKS[color])
+        if protected_squares > 0:
+            counts.append((PAWN_OFFSET + 11, protected_squares))
+        return counts
+
+    # UTILITY
+    def count_legal_pawn_moves(self, color):
+        """Counts the moves PawnEvaluator.count_legal_pawn_moves finds for every pawn of a color
+        with a single pass of legal move generation."""
+        board = self.board
+        if board.turn != color:
+            board = board.copy(stack=False)
+            board.turn = color
+
+        direction = 8 if color == chess.WHITE else -8
+        pawn_moves = {}
+        legal_moves = {
+            (move.from_square, move.to_square)
+            for move in board.generate_legal_moves(from_mask=self.pawns[color])
+            if move.promotion is None
+        }
+        for square in chess.scan_forward(self.pawns[color]):
+            count = 0
+
+            # Pushes, where a push onto the first rank is never counted
+            target_square_1 = square + direction
+            if chess.square_rank(target_square_1) >= 1 and (square, target_square_1) in legal_moves:
+                count += 1
+                if chess.square_rank(square) in {1, 6} and (square, target_square_1 + direction) in legal_moves:
+                    count += 1
+
+            # Captures, where a capture onto the a file is never counted
+            for file_offset in [-1, 1]:
+                capture_square = target_square_1 + file_offset
+                if chess.square_file(capture_square) != 0 and (square, capture_square) in legal_moves:
+                    count += 1
+
+            pawn_moves[square] = count
+        return pawn_moves
+
+
+class IncrementalBitboardEvaluator:
+    """Computes the BitboardEvaluator counts of positions reached from a common root position.
+
+    The counts of every piece in the root position are computed once. For a later position only
+    the pieces whose counts can have changed are recomputed: pieces that moved, were captured or
+    promoted, sliders whose attacks changed, pieces attacking a king zone that moved and pieces
+    whose pawn structure, connected rooks, bishop pair or pawn mobility changed. Kings are always
+    recomputed since castling rights depend on the whole move history.
+    """
+
+    def __init__(self, root_board: chess.Board):
+        self.root = BitboardEvaluator(root_board, count_pieces=False)
+        self.root_masks = self.piece_masks(root_board)
+
+        # square -> (piece type, color, attack mask, (weight index, count) pairs) of every root piece
+        self.root_pieces = {}
+        # Flat (W, B) counts, the count of weight i for color c is at 2 * i + c
+        self.root_counts = [0.0] * (2 * NUM_WEIGHTS)
+        for square, piece_type, color in self.root.pieces():
+            counts = self.root.counts_for_square(square, piece_type, color)
+            self.root_pieces[square] = (piece_type, color, self.root.piece_attacks(square, piece_type, color), counts)
+            self.add_counts(self.root_counts, counts, color, 1)
+
+    @staticmethod
+    def piece_masks(board):
+        return {(piece_type, color): board.pieces_mask(piece_type, color) for color in chess.COLORS for piece_type in chess.PIECE_TYPES}
+
+    @staticmethod
+    def add_counts(flat_counts, counts, color, sign):
+        color_idx = WHITE_SCORE_IDX if color == chess.WHITE else BLACK_SCORE_IDX
+        for weight_idx, count in counts:
+            flat_counts[2 * weight_idx + color_idx] += sign * count
+
+    def get_scores_for_weights(self, board: chess.Board):
+        """Returns the (W, B) count of every weight for the board, in the same flat order as
+        BitboardEvaluator.scores_for_weights."""
+        flat_counts = self.counts_for_board(board)
+        return [[flat_counts[2 * weight_idx], flat_counts[2 * weight_idx + 1]] for weight_idx in range(NUM_WEIGHTS)]
+
+    def counts_for_board(self, board: chess.Board):
+        root = self.root
+        current = BitboardEvaluator(board, count_pieces=False)
+        masks = self.piece_masks(board)
+
+        # Squares whose piece differs from the root position
+        changed_squares = 0
+        for key, mask in masks.items():
+            changed_squares |= mask ^ self.root_masks[key]
+
+        pawns_changed = {color: root.pawns[color] ^ current.pawns[color] for color in chess.COLORS}
+        rooks_changed = {color: root.rooks[color] ^ current.rooks[color] for color in chess.COLORS}
+        king_zones_changed = {color: root.king_zones[color] ^ current.king_zones[color] for color in chess.COLORS}
+        any_king_zone_changed = king_zones_changed[chess.WHITE] | king_zones_changed[chess.BLACK]
+        bishop_pair_changed = {color: (root.bishop_counts[color] >= 2) != (current.bishop_counts[color] >= 2) for color in chess.COLORS}
+
+        flat_counts = list(self.root_counts)
+
+        # Root pieces that are no longer on their square
+        for square in chess.scan_forward(changed_squares):
+            root_piece = self.root_pieces.get(square)
+            if root_piece is not None:
+                self.add_counts(flat_counts, root_piece[3], root_piece[1], -1)
+
+        for square, piece_type, color in current.pieces():
+            attacks = current.piece_attacks(square, piece_type, color)
+
+            if not changed_squares & chess.BB_SQUARES[square]:
+                root_attacks = self.root_pieces[square][2]
+                if not self.is_dirty(square, piece_type, color, attacks, root_attacks, current, pawns_changed, rooks_changed, any_king_zone_changed, bishop_pair_changed):
+                    continue
+                # The piece is still there but its counts changed
+                self.add_counts(flat_counts, self.root_pieces[square][3], color, -1)
+
+            self.add_counts(flat_counts, current.counts_for_square(square, piece_type, color), color, 1)
+
+        return flat_counts
+
+    def is_dirty(self, square, piece_type, color, attacks, root_attacks, current, pawns_changed, rooks_changed, any_king_zone_changed, bishop_pair_changed):
+        if piece_type == chess.KING or attacks != root_attacks:
+            return True
+
+        # King attack and defence counts
+        if attacks & any_king_zone_changed:
+            return True
+
+        if piece_type == chess.ROOK:
+            return bool(
+                (pawns_changed[chess.WHITE] | pawns_changed[chess.BLACK]) & chess.BB_FILES[chess.square_file(square)]
+                or rooks_changed[color] & attacks
+            )
+        elif piece_type == chess.KNIGHT:
+            return bool(KNIGHT_SUPPORT_MASKS[color][square] & pawns_changed[color])
+        elif piece_type == chess.BISHOP:
+            return bishop_pair_changed[color]
+        elif piece_type == chess.PAWN:
+            file = chess.square_file(square)
+            return bool(
+                current.pawn_moves[color].get(square, 0) != self.root.pawn_moves[color].get(square, 0)
+                or pawns_changed[color] & (chess.BB_FILES[file] | chess.BB_KING_ATTACKS[square])
+                or pawns_changed[not color] & ADJACENT_FILES_MASKS[file]
+                or rooks_changed[color] & FILE_AHEAD_MASKS[color][square]
+            )
+        return False
@@ -0,0 +1,211 @@
+import os
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from src.game.othello.othello_game import FULL_MASK, valid_moves_mask, flips_for_move
+
+DEFAULT_STORE_PATH = "./cache/othello_endgame.sqlite"
+
+# Masks of the four 4x4 quadrants, used for parity ordering
+QUADRANT_MASKS = [
+    sum(1 << (row * 8 + col) for row in rows for col in cols)
+    for rows in (range(0, 4), range(4, 8))
+    for cols in (range(0, 4), range(4, 8))
+]
+
+# Below this many empties the mobility of every child isn't worth computing and only parity is used
+FASTEST_FIRST_EMPTIES = 7
+# Below this many empties positions aren't stored in the transposition table
+TABLE_EMPTIES = 6
+
+# Move scores of this many positions are kept in memory, the rest are read back from the store
+MOVE_SCORES_ENTRIES = 10_000
+
+# Transposition table entry bounds
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+
+def popcount(mask: int) -> int:
+    return mask.bit_count()
+
+
+class EndgameStore:
+    """Persistent store of the exact move scores of solved positions, keyed by the two bitboards.
+
+    Every process (e.g. the workers of a process pool) opens its own connection the first time
+    it uses the store, so solved positions are shared between processes and runs.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = None
+        self.pid = None
+
+    def connect(self):
+        # A connection can't be used by a forked process
+        if self.connection is None or self.pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            self.connection = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self.pid = os.getpid()
+            with self.connection:
+                self.connection.execute(
+                    "CREATE TABLE IF NOT EXISTS move_scores ("
+                    "own TEXT NOT NULL, opponent TEXT NOT NULL, scores TEXT NOT NULL, "
+                    "PRIMARY KEY (own, opponent))"
+                )
+        return self.connection
+
+    def get(self, own: int, opponent: int):
+        """Returns the stored move scores or None if the position hasn't been solved."""
+        # Bitboards don't fit in a signed SQLite integer
+        with self.lock:
+            row = self.connect().execute(
+                "SELECT scores FROM move_scores WHERE own = ? AND opponent = ?", (str(own), str(opponent))
+            ).fetchone()
+
+        if row is None:
+            return None
+        return {int(cell): score for cell, score in json.loads(row[0]).items()}
+
+    def put(self, own: int, opponent: int, move_scores: dict[int, int]):
+        with self.lock:
+            connection = self.connect()
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO move_scores (own, opponent, scores) VALUES (?, ?, ?)",
+                    (str(own), str(opponent), json.dumps(move_scores)),
+                )
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+class EndgameSolver:
+    """Exact alpha-beta solver for the final disc difference of an Othello position with perfect play.
+
+    Moves that leave the opponent with the fewest replies are searched first (fastest-first), ties
+    and shallow nodes are ordered by parity, preferring quadrants with an odd number of empties.
+    Solved positions are kept in a transposition table while the moves of a position are solved,
+    it is cleared for every new position so it doesn't grow over a long run. The move scores of the
+    most recent positions are kept in memory and all of them in `store` if there is one.
+    """
+
+    def __init__(self, store: EndgameStore = None, max_move_scores=MOVE_SCORES_ENTRIES):
+        self.store = store
+        self.max_move_scores = max_move_scores
+        self.table = {}
+        self.move_scores = OrderedDict()
+        self.nodes = 0
+
+    def ordered_moves(self, own: int, opponent: int, moves: int, empty: int) -> list[tuple[int, int, int]]:
+        odd_quadrants = 0
+        for quadrant_mask in QUADRANT_MASKS:
+            if popcount(empty & quadrant_mask) % 2 == 1:
+                odd_quadrants |= quadrant_mask
+
+        fastest_first = popcount(empty) >= FASTEST_FIRST_EMPTIES
+        ordered = []
+        while moves:
+            move_mask = moves & -moves
+            moves ^= move_mask
+            flips = flips_for_move(own, opponent, move_mask)
+            # Fewer replies for the opponent and odd quadrants first. The replies are passed on to
+            # the child so it doesn't have to generate them again
+            replies = valid_moves_mask(opponent & ~flips, own | move_mask | flips) if fastest_first else None
+            num_replies = popcount(replies) if fastest_first else 0
+            ordered.append((num_replies, not move_mask & odd_quadrants, move_mask, flips, replies))
+        ordered.sort(key=lambda move: (move[0], move[1]))
+        return [(move_mask, flips, replies) for _, _, move_mask, flips, replies in ordered]
+
+    def negamax(self, own: int, opponent: int, alpha: int, beta: int, moves: int = None) -> int:
+        self.nodes += 1
+        empty = ~(own | opponent) & FULL_MASK
+        # Near the end of the game searching again is cheaper than the table
+        use_table = popcount(empty) >= TABLE_EMPTIES
+        key = (own, opponent)
+        entry = self.table.get(key) if use_table else None
+        if entry is not None:
+            score, bound = entry
+            if bound == EXACT:
+                return score
+            elif bound == LOWER_BOUND:
+                alpha = max(alpha, score)
+            else:
+                beta = min(beta, score)
+            if alpha >= beta:
+                return score
+
+        if moves is None:
+            moves = valid_moves_mask(own, opponent)
+        if not moves:
+            if not valid_moves_mask(opponent, own):
+                return popcount(own) - popcount(opponent)
+            # Pass
+            return -self.negamax(opponent, own, -beta, -alpha)
+
+        original_alpha = alpha
+        best_score = -64
+        for move_mask, flips, replies in self.ordered_moves(own, opponent, moves, empty):
+            score = -self.negamax(opponent & ~flips, own | move_mask | flips, -beta, -alpha, replies)
+            best_score = max(best_score, score)
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+
+        if use_table:
+            if best_score <= original_alpha:
+                bound = UPPER_BOUND
+            elif best_score >= beta:
+                bound = LOWER_BOUND
+            else:
+                bound = EXACT
+            self.table[key] = (best_score, bound)
+        return best_score
+
+    def solve(self, own: int, opponent: int) -> int:
+        """Final disc difference (player to move minus opponent) with perfect play from both sides."""
+        return self.negamax(own, opponent, -64, 64)
+
+    def solve_moves(self, own: int, opponent: int) -> dict[int, int]:
+        """Exact score of every valid move of the player to move, keyed by cell."""
+        key = (own, opponent)
+        if key in self.move_scores:
+            self.move_scores.move_to_end(key)
+            return self.move_scores[key]
+        if self.store is not None:
+            scores = self.store.get(own, opponent)
+            if scores is not None:
+                self.remember_move_scores(key, scores)
+                return scores
+
+        self.table.clear()
+        scores = {}
+        moves = valid_moves_mask(own, opponent)
+        while moves:
+            move_mask = moves & -moves
+            moves ^= move_mask
+            flips = flips_for_move(own, opponent, move_mask)
+            scores[move_mask.bit_length() - 1] = -self.solve(opponent & ~flips, own | move_mask | flips)
+        self.remember_move_scores(key, scores)
+        if self.store is not None:
+            self.store.put(own, opponent, scores)
+        return scores
+
+    def remember_move_scores(self, key, scores):
+        self.move_scores[key] = scores
+        while len(self.move_scores) > self.max_move_scores:
+            self.move_scores.popitem(last=False)
+
+
+# Shared by every OthelloGame, a position is only solved once and then read from the store by later runs
+shared_endgame_solver = EndgameSolver(EndgameStore())
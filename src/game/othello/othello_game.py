@@ -4,6 +4,174 @@ import matplotlib.pyplot as plt
 import numpy as np
 import math
 
+# A board is a (black, white) pair of 64-bit masks where bit `row * 8 + col` is the cell (row, col)
+Board = tuple[int, int]
+
+FULL_MASK = (1 << 64) - 1
+NOT_FIRST_COL = FULL_MASK & ~sum(1 << (row * 8) for row in range(8))
+NOT_LAST_COL = FULL_MASK & ~sum(1 << (row * 8 + 7) for row in range(8))
+
+# (shift, mask) for each direction. The mask clears the cells that wrapped around to the other side of the board
+DIRECTION_SHIFTS = [
+    (-8, FULL_MASK),  # (-1, +0)
+    (+8, FULL_MASK),  # (+1, +0)
+    (-1, NOT_LAST_COL),  # (+0, -1)
+    (+1, NOT_FIRST_COL),  # (+0, +1)
+    (-9, NOT_LAST_COL),  # (-1, -1)
+    (-7, NOT_FIRST_COL),  # (-1, +1)
+    (+7, NOT_LAST_COL),  # (+1, -1)
+    (+9, NOT_FIRST_COL),  # (+1, +1)
+]
+
+BIT_INDICES = np.arange(64, dtype=np.uint64)
+
+INITIAL_BOARD = (
+    (1 << (3 * 8 + 4)) | (1 << (4 * 8 + 3)),
+    (1 << (3 * 8 + 3)) | (1 << (4 * 8 + 4)),
+)
+
+# Reference weights for the initial, midgame and endgame phases.
+# Based on https://www.csse.uwa.edu.au/cig08/Proceedings/papers/8010.pdf
+REFERENCE_WEIGHTS_INITIAL = np.array(
+    [
+        [0, +0.00000, +0.00000, +0.00000, +0.00000, +0.00000, +0.00000, 0],
+        [0, -0.02231, +0.05583, +0.02004, +0.02004, +0.05583, -0.02231, 0],
+        [0, +0.05583, +0.10126, -0.10927, -0.10927, +0.10126, +0.05583, 0],
+        [0, +0.02004, -0.10927, -0.10155, -0.10155, -0.10927, +0.02004, 0],
+        [0, +0.02004, -0.10927, -0.10155, -0.10155, -0.10927, +0.02004, 0],
+        [0, +0.05583, +0.10126, -0.10927, -0.10927, +0.10126, +0.05583, 0],
+        [0, -0.02231, +0.05583, +0.02004, +0.02004, +0.05583, -0.02231, 0],
+        [0, +0.00000, +0.00000, +0.00000, +0.00000, +0.00000, +0.00000, 0],
+    ]
+)
+REFERENCE_WEIGHTS_MIDGAME = np.array(
+    [
+        [+6.32711, -3.32813, +0.33907, -2.00512, -2.00512, +0.33907, -3.32813, +6.32711],
+        [-3.32813, -1.52928, -1.87550, -0.18176, -0.18176, -1.87550, -1.52928, -3.32813],
+        [+0.33907, -1.87550, +1.06939, +0.62415, +0.62415, +1.06939, -1.87550, +0.33907],
+        [-2.00512, -0.18176, +0.62415, +0.10539, +0.10539, +0.62415, -0.18176, -2.00512],
+        [-2.00512, -0.18176, +0.62415, +0.10539, +0.10539, +0.62415, -0.18176, -2.00512],
+        [+0.33907, -1.87550, +1.06939, +0.62415, +0.62415, +1.06939, -1.87550, +0.33907],
+        [-3.32813, -1.52928, -1.87550, -0.18176, -0.18176, -1.87550, -1.52928, -3.32813],
+        [+6.32711, -3.32813, +0.33907, -2.00512, -2.00512, +0.33907, -3.32813, +6.32711],
+    ]
+)
+REFERENCE_WEIGHTS_ENDGAME = np.array(
+    [
+        [+5.50062, -0.17812, -2.58948, -0.59007, -0.59007, -2.58948, -0.17812, +5.50062],
+        [-0.17812, +0.96804, -2.16084, -2.01723, -2.01723, -2.16084, +0.96804, -0.17812],
+        [-2.58948, -2.16084, +0.49062, -1.07055, -1.07055, +0.49062, -2.16084, -2.58948],
+        [-0.59007, -2.01723, -1.07055, +0.73486, +0.73486, -1.07055, -2.01723, -0.59007],
+        [-0.59007, -2.01723, -1.07055, +0.73486, +0.73486, -1.07055, -2.01723, -0.59007],
+        [-2.58948, -2.16084, +0.49062, -1.07055, -1.07055, +0.49062, -2.16084, -2.58948],
+        [-0.17812, +0.96804, -2.16084, -2.01723, -2.01723, -2.16084, +0.96804, -0.17812],
+        [+5.50062, -0.17812, -2.58948, -0.59007, -0.59007, -2.58948, -0.17812, +5.50062],
+    ]
+)
+
+
+# Symmetry class of every cell under the 8 rotations and reflections of the board. Folding a cell into
+# the top left quadrant and then below the diagonal leaves the 10 cells (row, col) with col <= row < 4
+SYMMETRY_CLASS_CELLS = [(row, col) for row in range(4) for col in range(row + 1)]
+NUM_SYMMETRY_CLASSES = len(SYMMETRY_CLASS_CELLS)
+
+
+def symmetry_class(row: int, col: int) -> int:
+    row, col = min(row, 7 - row), min(col, 7 - col)
+    return SYMMETRY_CLASS_CELLS.index((max(row, col), min(row, col)))
+
+
+# (10, 64) matrix that expands the weight of each symmetry class to every cell in it
+SYMMETRY_EXPANSION = np.zeros((NUM_SYMMETRY_CLASSES, 64))
+for cell in range(64):
+    SYMMETRY_EXPANSION[symmetry_class(*divmod(cell, 8)), cell] = 1
+
+
+def flip_vertical(mask: int) -> int:
+    # Reverse the order of the rows
+    return int.from_bytes(mask.to_bytes(8, "little"), "big")
+
+
+def mirror_horizontal(mask: int) -> int:
+    # Reverse the order of the columns in every row
+    mask = ((mask >> 1) & 0x5555555555555555) | ((mask & 0x5555555555555555) << 1)
+    mask = ((mask >> 2) & 0x3333333333333333) | ((mask & 0x3333333333333333) << 2)
+    return ((mask >> 4) & 0x0F0F0F0F0F0F0F0F) | ((mask & 0x0F0F0F0F0F0F0F0F) << 4)
+
+
+def transpose(mask: int) -> int:
+    # Swap rows and columns
+    swap = 0x0F0F0F0F00000000 & (mask ^ (mask << 28))
+    mask ^= swap ^ (swap >> 28)
+    swap = 0x3333000033330000 & (mask ^ (mask << 14))
+    mask ^= swap ^ (swap >> 14)
+    swap = 0x5500550055005500 & (mask ^ (mask << 7))
+    return mask ^ swap ^ (swap >> 7)
+
+
+def canonical_board(board: Board) -> Board:
+    """
+    The smallest of the 8 rotations and reflections of a board, so symmetric positions share one key.
+    """
+    symmetries = []
+    for transposed in (board, tuple(transpose(mask) for mask in board)):
+        flipped = tuple(flip_vertical(mask) for mask in transposed)
+        symmetries.extend([
+            transposed,
+            flipped,
+            tuple(mirror_horizontal(mask) for mask in transposed),
+            tuple(mirror_horizontal(mask) for mask in flipped),
+        ])
+    return min(symmetries)
+
+
+def shift(mask: int, amount: int, wrap_mask: int) -> int:
+    if amount > 0:
+        return (mask << amount) & wrap_mask & FULL_MASK
+    return (mask >> -amount) & wrap_mask
+
+
+def valid_moves_mask(own: int, opponent: int) -> int:
+    """
+    The empty cells with a line of the opponent's pieces between them and one of the player's pieces.
+    """
+    empty = ~(own | opponent) & FULL_MASK
+
+    moves = 0
+    for amount, wrap_mask in DIRECTION_SHIFTS:
+        # Grow the lines of opponent pieces that start next to one of the player's pieces.
+        # Masking the targets instead of every shifted line keeps the shifts inline
+        targets = opponent & wrap_mask
+        if amount > 0:
+            line = (own << amount) & targets
+            for _ in range(5):
+                line |= (line << amount) & targets
+            moves |= (line << amount) & empty & wrap_mask
+        else:
+            amount = -amount
+            line = (own >> amount) & targets
+            for _ in range(5):
+                line |= (line >> amount) & targets
+            moves |= (line >> amount) & empty & wrap_mask
+    return moves
+
+
+def flips_for_move(own: int, opponent: int, move_mask: int) -> int:
+    """
+    The opponent's pieces flipped by playing the move.
+    """
+    flips = 0
+    for amount, wrap_mask in DIRECTION_SHIFTS:
+        # Walk over the opponent's pieces and flip them if the line ends with one of the player's pieces
+        line = 0
+        cell = shift(move_mask, amount, wrap_mask)
+        while cell & opponent:
+            line |= cell
+            cell = shift(cell, amount, wrap_mask)
+        if cell & own:
+            flips |= line
+    return flips
+
 
 class OthelloGame(BaseGame):
     BOARD_SIZE = 8
@@ -17,24 +185,63 @@ class OthelloGame(BaseGame):
     BLACK = +1
     WHITE = -1
 
+    # If True the weights are tied across the 8 symmetries of the board, so only the 10 weights of the
+    # symmetry classes are optimized (and the dataset treats symmetric positions as the same position)
+    SYMMETRIC = False
+
+    # Positions with at most this many empty cells are ranked by their exact endgame score
+    # instead of the reference tables (0 turns the endgame solver off)
+    ENDGAME_EMPTIES = 0
+
     def __init__(self, game: str = ""):
         self.game = game
-        self.board = np.full((self.BOARD_SIZE, self.BOARD_SIZE), self.EMPTY, dtype=int)
-        self.board[3, 3] = self.WHITE
-        self.board[3, 4] = self.BLACK
-        self.board[4, 3] = self.BLACK
-        self.board[4, 4] = self.WHITE
+        self.board = INITIAL_BOARD
         self.player = self.BLACK
-        self.weights = np.random.uniform(
-            self.WEIGHTS_MIN, self.WEIGHTS_MAX, size=(self.BOARD_SIZE, self.BOARD_SIZE)
-        )
-        for i in range(0, len(game), 2):
-            self.board = self.make_move(self.board, self.player, game[i : i + 2])
-            self.player = -self.player
+        self.update_weights(np.random.uniform(
+            self.WEIGHTS_MIN, self.WEIGHTS_MAX, size=self.num_weights()
+        ))
+        for board, player in self.replay(game):
+            self.board, self.player = board, player
         self.valid_moves = self.get_valid_moves(self.board, self.player)
 
+        # The board after every valid move (from the player's point of view) and its reference score only
+        # depend on the position, so the move scores for any set of weights are a single matrix product
+        child_boards = [self.to_array(self.make_move(self.board, self.player, move)) for move in self.valid_moves]
+        self.child_features = np.array(
+            [child_board.flatten() * self.player for child_board in child_boards]
+        ).reshape((len(self.valid_moves), self.BOARD_SIZE**2))
+        self.ref_scores = np.array(
+            [self.reference_score(child_board, self.player) for child_board in child_boards]
+        )
+        num_empty = 64 - bin(self.board[0] | self.board[1]).count("1")
+        if self.valid_moves and num_empty <= self.ENDGAME_EMPTIES:
+            self.ref_scores = self.exact_scores()
+
+    def num_weights(self) -> int:
+        return NUM_SYMMETRY_CLASSES if self.SYMMETRIC else self.BOARD_SIZE**2
+
+    def expand_weights(self, weights: np.ndarray) -> np.ndarray:
+        """
+        Expand symmetry class weights, either one vector or a (P, 10) population, to one weight per cell.
+        """
+        if self.SYMMETRIC:
+            return np.asarray(weights, dtype=float) @ SYMMETRY_EXPANSION
+        return np.asarray(weights, dtype=float)
+
+    def exact_scores(self) -> np.ndarray:
+        """
+        Final disc difference for the player after each valid move with perfect play from both sides.
+        """
+        from src.game.othello.endgame import shared_endgame_solver
+
+        own, opponent = self.player_masks(self.board, self.player)
+        move_scores = shared_endgame_solver.solve_moves(own, opponent)
+        return np.array([move_scores[row * self.BOARD_SIZE + col] for row, col in self.valid_moves], dtype=float)
+
     def update_weights(self, weights: list[float]):
-        self.weights = np.array(weights).reshape((self.BOARD_SIZE, self.BOARD_SIZE))
+        # The optimized weights, 10 in symmetric mode and 64 otherwise
+        self.optimized_weights = np.array(weights, dtype=float).flatten()
+        self.weights = self.expand_weights(self.optimized_weights).reshape((self.BOARD_SIZE, self.BOARD_SIZE))
 
     def get_board_data(self):
         return self.game
@@ -42,22 +249,28 @@ class OthelloGame(BaseGame):
     def get_best_move(self) -> tuple[int, int]:
         if not self.valid_moves:
             return None
-        move_scores = [
-            self.evaluate_board(
-                self.make_move(self.board, self.player, move), self.player
-            )
-            for move in self.valid_moves
-        ]
+        move_scores = self.child_features @ self.weights.flatten()
         best_move = self.valid_moves[np.argmax(move_scores)]
         return best_move
 
+    def search_best_move(self, max_depth=6, time_limit=None, node_limit=None) -> tuple[int, int]:
+        """
+        Best move from an alpha-beta search that scores the leaves with the weights.
+        The search deepens one ply at a time until `max_depth`, the time limit (in seconds)
+        or the node limit is reached.
+        """
+        from src.game.othello.search import AlphaBetaSearch
+
+        if not self.valid_moves:
+            return None
+        search = AlphaBetaSearch(self.weights)
+        cell, _, _ = search.search(
+            self.board, self.player == self.BLACK, max_depth=max_depth, time_limit=time_limit, node_limit=node_limit
+        )
+        return divmod(cell, self.BOARD_SIZE)
+
     def rank_move(self, move) -> tuple[int, int]:
-        move_scores = [
-            self.reference_score(
-                self.make_move(self.board, self.player, move), self.player
-            )
-            for move in self.valid_moves
-        ]
+        move_scores = self.ref_scores.tolist()
         if len(move_scores) == 0:
             return (0, math.inf)
         valid_moves, move_scores = zip(
@@ -69,41 +282,58 @@ class OthelloGame(BaseGame):
         return (index, len(valid_moves))
 
     def fitness(self) -> tuple[float, tuple[int, int], float]:
-        score = 0
-        best_score = -np.inf
-        best_move = None
-        valid_moves = self.get_valid_moves(self.board, self.player)
-        if not valid_moves:
-            return (score, (-1, -1), 0)
-        for move in valid_moves:
-            new_board = self.make_move(self.board, self.player, move)
-            new_score = self.evaluate_board(new_board, self.player)
-            ref_score = self.reference_score(new_board, self.player)
-            if new_score > best_score:
-                best_score = new_score
-                best_move = move
-            score += abs(new_score - ref_score)
-        return (score / len(valid_moves), best_move, best_score)
+        if not self.valid_moves:
+            return (0, (-1, -1), 0)
+        fitness_scores, best_move_indices, best_scores = self.fitness_batch(
+            self.optimized_weights.reshape((1, -1))
+        )
+        return (fitness_scores[0], self.valid_moves[best_move_indices[0]], best_scores[0])
+
+    def fitness_batch(
+        self, weights: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        weights = self.expand_weights(weights)
+        num_weights = weights.shape[0]
+        if not self.valid_moves:
+            return (np.zeros(num_weights), np.full(num_weights, -1), np.zeros(num_weights))
+
+        # (P, M) score of every valid move for every set of weights
+        move_scores = weights @ self.child_features.T
+        best_move_indices = np.argmax(move_scores, axis=1)
+        best_scores = move_scores[np.arange(num_weights), best_move_indices]
+        fitness_scores = np.sum(np.abs(move_scores - self.ref_scores), axis=1) / len(self.valid_moves)
+        return (fitness_scores, best_move_indices, best_scores)
+
+    def get_legal_moves(self) -> list[tuple[int, int]]:
+        return self.valid_moves
+
+    def position_key(self):
+        # The settings change the number of weights and the reference scores
+        return (self.board, self.player, self.SYMMETRIC, self.ENDGAME_EMPTIES)
 
     def get_weights(self) -> np.ndarray:
-        return self.weights.flatten()
+        return self.optimized_weights.copy()
 
     def get_weight_bounds(self) -> list[tuple[int, int]]:
         return [
-            (self.WEIGHTS_MIN, self.WEIGHTS_MAX) for _ in range(self.BOARD_SIZE**2)
+            (self.WEIGHTS_MIN, self.WEIGHTS_MAX) for _ in range(self.num_weights())
         ]
 
     def get_weight_labels(self):
         letters = "ABCDEFGH"
         numbers = "12345678"
+        if self.SYMMETRIC:
+            # Each symmetry class is labelled by its cell in the top left corner
+            return [f"{numbers[row]}{letters[col]}" for row, col in SYMMETRY_CLASS_CELLS]
         return [f"{i}{j}" for i in numbers for j in letters]
 
     def visualize_best_move(self, img_size):
         our_best_move = self.get_best_move()
         ref_moves = [self.rank_move(move) for move in self.valid_moves]
         ref_best_move = min(zip(ref_moves, self.valid_moves), key=lambda x: x[0][0])[1]
-        black_x, black_y = np.where(self.board == self.BLACK) 
-        white_x, white_y = np.where(self.board == self.WHITE)
+        board = self.to_array(self.board)
+        black_x, black_y = np.where(board == self.BLACK) 
+        white_x, white_y = np.where(board == self.WHITE)
         plt.figure(figsize=(8,8))
         plt.gca().set_facecolor('green')
         plt.scatter(black_x+0.5, black_y+0.5, c='black', s=1000, marker='o')
@@ -120,153 +350,98 @@ class OthelloGame(BaseGame):
         plt.show()
         return
 
-    def is_valid_move(
-        self,
-        board: np.ndarray,
-        player: int,
-        move: tuple[int, int],
-        direction: tuple[int, int],
-    ) -> bool:
+    def to_array(self, board: Board) -> np.ndarray:
         """
-        Check if a move is legal by checking if there is an opponent's piece adjacent to the move
-        and if there is a player's piece in the direction of the opponent's piece.
+        Convert a (black, white) mask pair to an 8x8 array of EMPTY, BLACK and WHITE cells.
         """
-        opponent = -player
-        row, col = move
-        r, c = row + direction[0], col + direction[1]
-
-        # Check if the move is within bounds
-        if not (0 <= r < self.BOARD_SIZE and 0 <= c < self.BOARD_SIZE):
-            return False
-
-        # Check if there is an opponent's piece adjacent to the move
-        if board[r, c] != opponent:
-            return False
-
-        # Continue in the direction until an empty space or the player's piece is found
-        while (
-            0 <= r < self.BOARD_SIZE
-            and 0 <= c < self.BOARD_SIZE
-            and board[r, c] == opponent
-        ):
-            r, c = r + direction[0], c + direction[1]
-
-        # Check if the move is valid by ensuring a player's piece is found after opponent's pieces
-        return (
-            0 <= r < self.BOARD_SIZE
-            and 0 <= c < self.BOARD_SIZE
-            and board[r, c] == player
+        black = (np.uint64(board[0]) >> BIT_INDICES) & np.uint64(1)
+        white = (np.uint64(board[1]) >> BIT_INDICES) & np.uint64(1)
+        return (black.astype(int) * self.BLACK + white.astype(int) * self.WHITE).reshape(
+            (self.BOARD_SIZE, self.BOARD_SIZE)
         )
 
-    def get_valid_moves(self, board: np.ndarray, player: int) -> list[tuple[int, int]]:
+    @classmethod
+    def replay(cls, game: str):
+        """
+        Play the moves of a game string in one pass, yielding the board and the player to move after every move.
+        """
+        board = INITIAL_BOARD
+        player = cls.BLACK
+        for i in range(0, len(game), 2):
+            board = cls.make_move(board, player, game[i : i + 2])
+            player = -player
+            yield board, player
+
+    @classmethod
+    def player_masks(cls, board: Board, player: int) -> tuple[int, int]:
+        """
+        Split the board into the (player, opponent) masks.
+        """
+        black, white = board
+        return (black, white) if player == cls.BLACK else (white, black)
+
+    def get_valid_moves(self, board: Board, player: int) -> list[tuple[int, int]]:
+        """
+        A move is valid if it is on an empty cell and there is a line of the opponent's pieces
+        between it and one of the player's pieces in at least one direction.
+        """
+        own, opponent = self.player_masks(board, player)
+        moves = valid_moves_mask(own, opponent)
+
+        # Ascending bits are in row-major order
         valid_moves = []
-        directions = [
-            (-1, +0),
-            (+1, +0),
-            (+0, -1),
-            (+0, +1),
-            (-1, -1),
-            (-1, +1),
-            (+1, -1),
-            (+1, +1),
-        ]
-        for row in range(8):
-            for col in range(8):
-                if board[row, col] == self.EMPTY:  # Check empty positions
-                    for direction in directions:
-                        if self.is_valid_move(board, player, (row, col), direction):
-                            valid_moves.append((row, col))
-                            break
+        while moves:
+            square = (moves & -moves).bit_length() - 1
+            valid_moves.append(divmod(square, self.BOARD_SIZE))
+            moves &= moves - 1
         return valid_moves
 
+    @classmethod
     def make_move(
-        self, board: np.ndarray, player: int, move: tuple[int, int] | str
-    ) -> np.ndarray:
+        cls, board: Board, player: int, move: tuple[int, int] | str
+    ) -> Board:
         """
         Make a move on the board by flipping the opponent's pieces in the directions of the player's pieces.
         """
-        board_copy = board.copy()
         if isinstance(move, str):
             move = (int(move[1]) - 1, ord(move[0]) - ord("A"))
-        opponent = -player
-        board_copy[move] = player
-        directions = [
-            (-1, +0),
-            (+1, +0),
-            (+0, -1),
-            (+0, +1),
-            (-1, -1),
-            (-1, +1),
-            (+1, -1),
-            (+1, +1),
-        ]
-        for direction in directions:
-            if self.is_valid_move(board_copy, player, move, direction):
-                r, c = move
-                r, c = r + direction[0], c + direction[1]
-                while board_copy[r, c] == opponent:
-                    board_copy[r, c] = player
-                    r, c = r + direction[0], c + direction[1]
-        return board_copy
-
-    def evaluate_board(self, board: np.ndarray, player: int) -> float:
+        own, opponent = cls.player_masks(board, player)
+        move_mask = 1 << (move[0] * cls.BOARD_SIZE + move[1])
+        own |= move_mask
+        opponent &= ~move_mask
+
+        flips = flips_for_move(own, opponent, move_mask)
+        own |= flips
+        opponent &= ~flips
+        return (own, opponent) if player == cls.BLACK else (opponent, own)
+
+    def evaluate_board(self, board: Board | np.ndarray, player: int) -> float:
+        if isinstance(board, tuple):
+            board = self.to_array(board)
         return np.sum(board * self.weights * player)
 
-    def reference_score(self, board: np.ndarray, player: int) -> float:
-        # Based on https://www.csse.uwa.edu.au/cig08/Proceedings/papers/8010.pdf
-        weight_initial = np.array(
-            [
-                [0, +0.00000, +0.00000, +0.00000, +0.00000, +0.00000, +0.00000, 0],
-                [0, -0.02231, +0.05583, +0.02004, +0.02004, +0.05583, -0.02231, 0],
-                [0, +0.05583, +0.10126, -0.10927, -0.10927, +0.10126, +0.05583, 0],
-                [0, +0.02004, -0.10927, -0.10155, -0.10155, -0.10927, +0.02004, 0],
-                [0, +0.02004, -0.10927, -0.10155, -0.10155, -0.10927, +0.02004, 0],
-                [0, +0.05583, +0.10126, -0.10927, -0.10927, +0.10126, +0.05583, 0],
-                [0, -0.02231, +0.05583, +0.02004, +0.02004, +0.05583, -0.02231, 0],
-                [0, +0.00000, +0.00000, +0.00000, +0.00000, +0.00000, +0.00000, 0],
-            ]  
-        )
-        weight_midgame = np.array(
-            [
-                [+6.32711, -3.32813, +0.33907, -2.00512, -2.00512, +0.33907, -3.32813, +6.32711],
-                [-3.32813, -1.52928, -1.87550, -0.18176, -0.18176, -1.87550, -1.52928, -3.32813],
-                [+0.33907, -1.87550, +1.06939, +0.62415, +0.62415, +1.06939, -1.87550, +0.33907],
-                [-2.00512, -0.18176, +0.62415, +0.10539, +0.10539, +0.62415, -0.18176, -2.00512],
-                [-2.00512, -0.18176, +0.62415, +0.10539, +0.10539, +0.62415, -0.18176, -2.00512],
-                [+0.33907, -1.87550, +1.06939, +0.62415, +0.62415, +1.06939, -1.87550, +0.33907],
-                [-3.32813, -1.52928, -1.87550, -0.18176, -0.18176, -1.87550, -1.52928, -3.32813],
-                [+6.32711, -3.32813, +0.33907, -2.00512, -2.00512, +0.33907, -3.32813, +6.32711],
-            ]
-        )
-        weight_endgame = np.array(
-            [
-                [+5.50062, -0.17812, -2.58948, -0.59007, -0.59007, -2.58948, -0.17812, +5.50062],
-                [-0.17812, +0.96804, -2.16084, -2.01723, -2.01723, -2.16084, +0.96804, -0.17812],
-                [-2.58948, -2.16084, +0.49062, -1.07055, -1.07055, +0.49062, -2.16084, -2.58948],
-                [-0.59007, -2.01723, -1.07055, +0.73486, +0.73486, -1.07055, -2.01723, -0.59007],
-                [-0.59007, -2.01723, -1.07055, +0.73486, +0.73486, -1.07055, -2.01723, -0.59007],
-                [-2.58948, -2.16084, +0.49062, -1.07055, -1.07055, +0.49062, -2.16084, -2.58948],
-                [-0.17812, +0.96804, -2.16084, -2.01723, -2.01723, -2.16084, +0.96804, -0.17812],
-                [+5.50062, -0.17812, -2.58948, -0.59007, -0.59007, -2.58948, -0.17812, +5.50062],
-            ]
-        )
+    def reference_score(self, board: Board | np.ndarray, player: int) -> float:
+        if isinstance(board, tuple):
+            board = self.to_array(board)
         n_corner_occupied = np.sum(board[[0, 0, -1, -1], [0, -1, 0, -1]] != self.EMPTY)
         if n_corner_occupied == 0:
-            return np.sum(board * weight_initial * player)
+            return np.sum(board * REFERENCE_WEIGHTS_INITIAL * player)
         elif n_corner_occupied == 1:
-            return np.sum(board * weight_midgame * player)
+            return np.sum(board * REFERENCE_WEIGHTS_MIDGAME * player)
         else:
-            return np.sum(board * weight_endgame * player)
+            return np.sum(board * REFERENCE_WEIGHTS_ENDGAME * player)
         
     def __str__(self):
+        black, white = self.board
         board_str = ""
         for row in range(self.BOARD_SIZE):
             for col in range(self.BOARD_SIZE):
-                if self.board[row, col] == self.EMPTY:
-                    board_str += "."
-                elif self.board[row, col] == self.BLACK:
+                cell = 1 << (row * self.BOARD_SIZE + col)
+                if black & cell:
                     board_str += "B"
-                elif self.board[row, col] == self.WHITE:
+                elif white & cell:
                     board_str += "W"
+                else:
+                    board_str += "."
             board_str += "\n"
         return board_str
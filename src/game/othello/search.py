@@ -0,0 +1,251 @@
+import time
+import random
+
+import numpy as np
+
+from src.game.othello.othello_game import valid_moves_mask, flips_for_move
+
+# Zobrist keys for a black or white piece on each cell and for white to move
+_zobrist_random = random.Random(0x07E110)
+ZOBRIST_PIECES = [[_zobrist_random.getrandbits(64) for _ in range(64)] for _ in range(2)]
+ZOBRIST_WHITE_TO_MOVE = _zobrist_random.getrandbits(64)
+# Flipping a piece swaps its color, which toggles both of its keys
+ZOBRIST_FLIPS = [ZOBRIST_PIECES[0][cell] ^ ZOBRIST_PIECES[1][cell] for cell in range(64)]
+
+# Scores of finished games are outside the range of any evaluation, the disc difference breaks ties
+WIN_SCORE = 1e12
+
+# Transposition table entry bounds
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+
+class SearchBudgetExceeded(Exception):
+    pass
+
+
+class AlphaBetaSearch:
+    """Iterative deepening negamax with alpha-beta pruning over the (black, white) masks of OthelloGame.
+
+    Leaves are scored with the learned per-cell weights from the point of view of the player to move.
+    Moves are searched in transposition table order first and then by the weight of the cell.
+    The transposition table has a fixed number of slots indexed by the Zobrist hash. A slot is
+    replaced by a search from a newer iteration or by a search that is at least as deep.
+    """
+
+    def __init__(self, weights, table_size=1 << 18):
+        weights = np.asarray(weights, dtype=float).flatten()
+        self.cell_weights = weights.tolist()
+        # Sum of the weights of the cells set in each byte of each row, so a mask is scored with 8 lookups
+        self.row_weights = [
+            [sum(weights[row * 8 + col] for col in range(8) if byte >> col & 1) for byte in range(256)]
+            for row in range(8)
+        ]
+
+        self.table_size = table_size
+        self.table = [None] * table_size
+        self.generation = 0
+        self.nodes = 0
+        self.deadline = None
+        self.node_limit = None
+
+        self.masks = [0, 0]
+        self.color = 0
+        self.hash = 0
+
+    def set_position(self, board, black_to_move):
+        self.masks = list(board)
+        self.color = 0 if black_to_move else 1
+        self.hash = ZOBRIST_WHITE_TO_MOVE if self.color == 1 else 0
+        for color in range(2):
+            mask = self.masks[color]
+            while mask:
+                cell = (mask & -mask).bit_length() - 1
+                self.hash ^= ZOBRIST_PIECES[color][cell]
+                mask &= mask - 1
+
+    def score_mask(self, mask):
+        row_weights = self.row_weights
+        return sum(row_weights[row][(mask >> (row * 8)) & 0xFF] for row in range(8))
+
+    def evaluate(self):
+        return self.score_mask(self.masks[self.color]) - self.score_mask(self.masks[1 - self.color])
+
+    def final_score(self):
+        disc_difference = bin(self.masks[self.color]).count("1") - bin(self.masks[1 - self.color]).count("1")
+        if disc_difference > 0:
+            return WIN_SCORE + disc_difference
+        elif disc_difference < 0:
+            return -WIN_SCORE + disc_difference
+        return 0.0
+
+    def make_move(self, cell):
+        """Plays the move in place and returns the flipped pieces needed to undo it."""
+        own, opponent = self.masks[self.color], self.masks[1 - self.color]
+        move_mask = 1 << cell
+        flips = flips_for_move(own, opponent, move_mask)
+
+        self.masks[self.color] = own | move_mask | flips
+        self.masks[1 - self.color] = opponent & ~flips
+        self.hash ^= ZOBRIST_PIECES[self.color][cell] ^ ZOBRIST_WHITE_TO_MOVE
+        flipped = flips
+        while flipped:
+            self.hash ^= ZOBRIST_FLIPS[(flipped & -flipped).bit_length() - 1]
+            flipped &= flipped - 1
+        self.color = 1 - self.color
+        return flips
+
+    def unmake_move(self, cell, flips):
+        self.color = 1 - self.color
+        move_mask = 1 << cell
+
+        self.masks[self.color] &= ~(move_mask | flips)
+        self.masks[1 - self.color] |= flips
+        self.hash ^= ZOBRIST_PIECES[self.color][cell] ^ ZOBRIST_WHITE_TO_MOVE
+        flipped = flips
+        while flipped:
+            self.hash ^= ZOBRIST_FLIPS[(flipped & -flipped).bit_length() - 1]
+            flipped &= flipped - 1
+
+    def pass_move(self):
+        self.color = 1 - self.color
+        self.hash ^= ZOBRIST_WHITE_TO_MOVE
+
+    def ordered_moves(self, moves, table_move):
+        cells = []
+        while moves:
+            cells.append((moves & -moves).bit_length() - 1)
+            moves &= moves - 1
+        cells.sort(key=lambda cell: self.cell_weights[cell], reverse=True)
+        if table_move is not None and table_move in cells:
+            cells.remove(table_move)
+            cells.insert(0, table_move)
+        return cells
+
+    def probe(self):
+        entry = self.table[self.hash % self.table_size]
+        if entry is not None and entry[0] == self.hash:
+            return entry
+        return None
+
+    def store(self, depth, score, bound, best_move):
+        slot = self.hash % self.table_size
+        entry = self.table[slot]
+        if entry is None or entry[5] != self.generation or depth >= entry[1]:
+            self.table[slot] = (self.hash, depth, score, bound, best_move, self.generation)
+
+    def check_budget(self):
+        self.nodes += 1
+        if self.node_limit is not None and self.nodes > self.node_limit:
+            raise SearchBudgetExceeded()
+        if self.deadline is not None and self.nodes % 1024 == 0 and time.perf_counter() > self.deadline:
+            raise SearchBudgetExceeded()
+
+    def negamax(self, depth, alpha, beta):
+        self.check_budget()
+        original_alpha = alpha
+
+        entry = self.probe()
+        table_move = None
+        if entry is not None:
+            table_move = entry[4]
+            if entry[1] >= depth:
+                score, bound = entry[2], entry[3]
+                if bound == EXACT:
+                    return score
+                elif bound == LOWER_BOUND:
+                    alpha = max(alpha, score)
+                else:
+                    beta = min(beta, score)
+                if alpha >= beta:
+                    return score
+
+        own, opponent = self.masks[self.color], self.masks[1 - self.color]
+        moves = valid_moves_mask(own, opponent)
+        if not moves:
+            if not valid_moves_mask(opponent, own):
+                return self.final_score()
+            # Passing doesn't use up depth, the opponent has to have a move
+            self.pass_move()
+            try:
+                return -self.negamax(depth, -beta, -alpha)
+            finally:
+                self.pass_move()
+
+        if depth == 0:
+            return self.evaluate()
+
+        best_score = -float("inf")
+        best_move = None
+        for cell in self.ordered_moves(moves, table_move):
+            flips = self.make_move(cell)
+            try:
+                score = -self.negamax(depth - 1, -beta, -alpha)
+            finally:
+                self.unmake_move(cell, flips)
+
+            if score > best_score:
+                best_score, best_move = score, cell
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+
+        if best_score <= original_alpha:
+            bound = UPPER_BOUND
+        elif best_score >= beta:
+            bound = LOWER_BOUND
+        else:
+            bound = EXACT
+        self.store(depth, best_score, bound, best_move)
+        return best_score
+
+    def search_root(self, depth, first_move):
+        alpha, beta = -float("inf"), float("inf")
+        best_score = -float("inf")
+        best_move = None
+        moves = valid_moves_mask(self.masks[self.color], self.masks[1 - self.color])
+        for cell in self.ordered_moves(moves, first_move):
+            flips = self.make_move(cell)
+            try:
+                score = -self.negamax(depth - 1, -beta, -alpha)
+            finally:
+                self.unmake_move(cell, flips)
+
+            if score > best_score:
+                best_score, best_move = score, cell
+            alpha = max(alpha, score)
+
+        self.store(depth, best_score, EXACT, best_move)
+        return best_move, best_score
+
+    def search(self, board, black_to_move, max_depth=6, time_limit=None, node_limit=None):
+        """Returns the (cell, score, depth) of the deepest completed iteration, or (None, None, 0)
+        if the player to move has no moves. The first iteration always completes."""
+        self.set_position(board, black_to_move)
+        if not valid_moves_mask(self.masks[self.color], self.masks[1 - self.color]):
+            return (None, None, 0)
+
+        self.nodes = 0
+        start_time = time.perf_counter()
+        best_move, best_score, completed_depth = None, None, 0
+        for depth in range(1, max_depth + 1):
+            self.generation += 1
+            # The budget only applies once there is a move to fall back on
+            if completed_depth > 0:
+                self.deadline = start_time + time_limit if time_limit is not None else None
+                self.node_limit = node_limit
+
+            try:
+                best_move, best_score = self.search_root(depth, best_move)
+            except SearchBudgetExceeded:
+                break
+            completed_depth = depth
+
+            # Nothing left to search once the game tree is exhausted
+            if abs(best_score) >= WIN_SCORE:
+                break
+
+        self.deadline = None
+        self.node_limit = None
+        return (best_move, best_score, completed_depth)
@@ -0,0 +1,63 @@
+import numpy as np
+
+from src.game.base_game import BaseGame
+
+
+class PositionBatch(BaseGame):
+    """A mini-batch of positions of the same game scored with a single set of weights.
+
+    The fitness of a set of weights is its mean fitness over the positions. Everything that is about
+    a single position (best move, best score, move rank, legal moves, visualization) is taken from the
+    first position of the batch. The best move and rank an optimizer records in its history for a
+    batch are therefore those of the first position only, they don't summarize the positions the
+    fitness is averaged over.
+    """
+
+    def __init__(self, games: list[BaseGame]):
+        self.games = games
+
+    def update_weights(self, weights):
+        # The weights are only needed by the first position, the batch is scored with fitness_batch
+        self.games[0].update_weights(weights)
+
+    def get_weights(self):
+        return self.games[0].get_weights()
+
+    def get_board_data(self):
+        return [game.get_board_data() for game in self.games]
+
+    def get_best_move(self):
+        return self.games[0].get_best_move()
+
+    def rank_move(self, move):
+        return self.games[0].rank_move(move)
+
+    def fitness(self):
+        fitness_scores, best_move_indices, best_scores = self.fitness_batch(np.array([self.get_weights()], dtype=float))
+        best_move = self.get_legal_moves()[best_move_indices[0]] if best_move_indices[0] >= 0 else None
+        return (float(fitness_scores[0]), best_move, float(best_scores[0]))
+
+    def fitness_batch(self, weights):
+        weights = np.asarray(weights, dtype=float)
+        results = [game.fitness_batch(weights) for game in self.games]
+        fitness_scores = np.mean([fitness_scores for fitness_scores, _, _ in results], axis=0)
+        _, best_move_indices, best_scores = results[0]
+        return (fitness_scores, best_move_indices, best_scores)
+
+    def evaluation_context(self):
+        return PositionBatch([game.evaluation_context() for game in self.games])
+
+    def position_key(self):
+        return tuple(game.position_key() for game in self.games)
+
+    def get_legal_moves(self):
+        return self.games[0].get_legal_moves()
+
+    def get_weight_bounds(self):
+        return self.games[0].get_weight_bounds()
+
+    def get_weight_labels(self):
+        return self.games[0].get_weight_labels()
+
+    def visualize_best_move(self, img_size):
+        return self.games[0].visualize_best_move(img_size)
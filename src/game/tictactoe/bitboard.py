@@ -0,0 +1,71 @@
+# Bit i of a mask is cell i of the board (row-major), X and O each have their own mask
+NUM_CELLS = 9
+FULL_MASK = (1 << NUM_CELLS) - 1
+NUM_MASKS = 1 << NUM_CELLS
+CELL_MASKS = [1 << cell for cell in range(NUM_CELLS)]
+
+
+def _mask(cells):
+    mask = 0
+    for cell in cells:
+        mask |= CELL_MASKS[cell]
+    return mask
+
+
+WINNING_LINES = [(0, 1, 2), (3, 4, 5), (6, 7, 8), (0, 3, 6), (1, 4, 7), (2, 5, 8), (0, 4, 8), (2, 4, 6)]
+LINE_MASKS = [_mask(line) for line in WINNING_LINES]
+
+# Horizontally and vertically adjacent cells, in the same order as tttGame.two_in_a_row
+TWO_IN_A_ROW_PAIRS = [(0, 1), (1, 2), (0, 3), (2, 5), (3, 6), (5, 8), (6, 7), (7, 8), (1, 4), (3, 4), (4, 5), (4, 7)]
+PAIR_MASKS = [_mask(pair) for pair in TWO_IN_A_ROW_PAIRS]
+
+CORNERS = [0, 2, 6, 8]
+CORNER_MASK = _mask(CORNERS)
+MIDDLE_MASK = CELL_MASKS[4]
+
+# Three corners make a fork
+FORK_CORNERS = [(0, 2, 6), (2, 6, 8), (0, 2, 8), (0, 6, 8)]
+FORK_MASKS = [_mask(fork) for fork in FORK_CORNERS]
+
+
+def _contains_any(mask, masks):
+    return any(mask & other == other for other in masks)
+
+
+# Lookup tables indexed by the mask of one player
+IS_WIN = [_contains_any(mask, LINE_MASKS) for mask in range(NUM_MASKS)]
+HAS_FORK = [_contains_any(mask, FORK_MASKS) for mask in range(NUM_MASKS)]
+TWO_IN_A_ROW_COUNT = [sum(mask & pair == pair for pair in PAIR_MASKS) for mask in range(NUM_MASKS)]
+CELL_COUNT = [bin(mask).count("1") for mask in range(NUM_MASKS)]
+CORNER_COUNT = [CELL_COUNT[mask & CORNER_MASK] for mask in range(NUM_MASKS)]
+# The cells of a mask as a base 4 number, so a board is indexed with one lookup per symbol
+BASE_4_VALUE = [sum(4 ** cell for cell in range(NUM_CELLS) if mask >> cell & 1) for mask in range(NUM_MASKS)]
+
+
+def board_masks(board):
+    """
+    Returns the (X, O, empty) masks of a list board. Cells with any other symbol are in none of them.
+    """
+    x_mask = o_mask = empty_mask = 0
+    for cell, spot in enumerate(board):
+        if spot == "X":
+            x_mask |= CELL_MASKS[cell]
+        elif spot == "O":
+            o_mask |= CELL_MASKS[cell]
+        elif spot == " " or spot == "":
+            empty_mask |= CELL_MASKS[cell]
+    return x_mask, o_mask, empty_mask
+
+
+def mask_cells(mask):
+    """Cells set in the mask, in increasing order."""
+    return [cell for cell in range(NUM_CELLS) if mask >> cell & 1]
+
+
+def mask_winner(x_mask, o_mask):
+    # X is reported first when both players have a line
+    if IS_WIN[x_mask]:
+        return "X"
+    elif IS_WIN[o_mask]:
+        return "O"
+    return None
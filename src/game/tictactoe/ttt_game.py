@@ -3,8 +3,12 @@ import math
 import chess
 import chess.svg
 import random
+import numpy as np
 from src.game.base_game import BaseGame
-from src.utility.ttt_extraction import available_moves, make_move, undo_move, check_winner, minimax
+from src.game.tictactoe.bitboard import (
+    CELL_MASKS, CORNER_MASK, MIDDLE_MASK, IS_WIN, HAS_FORK, TWO_IN_A_ROW_COUNT, CORNER_COUNT, board_masks, mask_cells, mask_winner
+)
+from src.utility.ttt_extraction import read_ttt_boards, solved_moves_and_scores
 from itertools import permutations
 import json
 
@@ -34,15 +38,60 @@ weight_bounds = [
     (-10, 10), # creating-fork-for-next-move
 ]
 
+# Stacked move features, minimax scores and first row of every board in the csv
+all_states = None
+
+
+def load_all_states():
+    global all_states
+    if all_states is None:
+        # Creating the games draws their random weights, which shouldn't change what the optimizers draw
+        random_state = random.getstate()
+        try:
+            games = [tttGame((board, solved_moves_and_scores(board))) for board in read_ttt_boards()]
+        finally:
+            random.setstate(random_state)
+        num_moves = np.array([len(game.legal_moves) for game in games])
+        all_states = (
+            np.concatenate([game.move_features for game in games]),
+            np.concatenate([game.target_scores for game in games]),
+            np.concatenate(([0], np.cumsum(num_moves)[:-1])),
+            num_moves,
+        )
+    return all_states
+
+
+def all_states_fitness(weights):
+    """
+    Fitness of each row of a (P, D) matrix of weights on every board in the csv, as a (P, number of boards) array.
+    Every move of every board is scored with a single matrix product.
+    """
+    move_features, target_scores, first_rows, num_moves = load_all_states()
+    evaluated_scores = np.atleast_2d(np.asarray(weights, dtype=float)) @ move_features.T
+    errors = np.abs(target_scores - evaluated_scores)
+    return -np.add.reduceat(errors, first_rows, axis=1) / num_moves
+
+
 class tttGame(BaseGame):
     def __init__(self, meta):
         board, moves_and_scores = meta
 
         self.board = board
         self.moves_and_scores = moves_and_scores
+        # The features are computed from the X and O masks of the board, neutral cells are in neither
+        self.x_mask, self.o_mask, self.empty_mask = board_masks(board)
         self.initialize_random_weights()
         self.rank_moves()
-        
+
+        # The score of a move is linear in the weights, so the feature deltas of every legal move
+        # and their minimax scores only need to be computed once per board
+        self.legal_moves = mask_cells(self.empty_mask)
+        self.move_features = np.array([self.compute_move_features(move) for move in self.legal_moves], dtype=float).reshape((-1, len(weight_bounds)))
+        self.move_ranks = {}
+        for rank, (move, _) in enumerate(self.moves_and_scores):
+            self.move_ranks.setdefault(move, rank)
+        minimax_scores = {move: score for move, score in self.moves_and_scores}
+        self.target_scores = np.array([minimax_scores.get(move, 0) for move in self.legal_moves], dtype=float)
 
     # Random starting genes for the chromosome based on lower and upper bounds
     def initialize_random_weights(self):
@@ -52,20 +101,14 @@ class tttGame(BaseGame):
         return [self.board, self.moves_and_scores]
 
     def rank_move(self, move):
-        rank = 0
-        for v in self.moves_and_scores:
-            if v[0] == move:
-                return (rank, len(list(self.moves_and_scores)))
-            rank += 1
-        
-        return (rank, len(list(self.moves_and_scores)))
+        num_moves = len(self.moves_and_scores)
+        return (self.move_ranks.get(move, num_moves), num_moves)
 
     def get_weights(self):
         return self.weights
     
     def get_best_move(self):
-        best_move, best_score = self.determine_best_move_from_weights()
-        return best_move
+        return self.legal_moves[int(np.argmax(self.move_features @ np.asarray(self.weights, dtype=float)))]
     
     def rank_moves(self):
         self.moves_and_scores = sorted(self.moves_and_scores, key=lambda x: x[1], reverse=True)
@@ -82,158 +125,91 @@ class tttGame(BaseGame):
     def update_weights(self, weights):
         self.weights = weights
     
+    def get_legal_moves(self):
+        return self.legal_moves
+
+    def position_key(self):
+        return tuple(self.board)
+
     # Cost is the minimax difference between the actual best move and the predicted best move
     def fitness(self):
-        score = 0
-        
-        # start with random guesses
-        best_move = available_moves(self.board)[0]
-        best_score = -math.inf
-
-        avail_moves = available_moves(self.board)
-        for move in avail_moves:
-            # evaluated_score measures how much board has improved, higher = better according to weights
-            evaluated_score = self.evaluate_move(move)
-            
-            minimax_score = 0
-            for v in self.moves_and_scores:
-                if v[0] == move:
-                    minimax_score = v[1]          
-            
-            if evaluated_score > best_score:
-                best_move = move
-                best_score = evaluated_score
-            
-            score -= abs(minimax_score - evaluated_score)
+        fitness_scores, best_move_indices, best_scores = self.fitness_batch(np.array([self.weights], dtype=float))
+        return (fitness_scores[0], self.legal_moves[best_move_indices[0]], best_scores[0])
+
+    def fitness_batch(self, weights):
+        # evaluated_score measures how much board has improved, higher = better according to weights
+        evaluated_scores = np.asarray(weights, dtype=float) @ self.move_features.T
+        best_move_indices = np.argmax(evaluated_scores, axis=1)
+        best_scores = evaluated_scores[np.arange(len(evaluated_scores)), best_move_indices]
 
         # TODO: Confirm with Ben that this is the correct way to calculate score and fitness
         # TODO: Merge chess fix
         # genetic algorithm is looking for maximum score, this is driving the score down when there is a difference between minimax and evaluated
-        return (score/len(avail_moves), best_move, best_score)
+        fitness_scores = -np.sum(np.abs(self.target_scores - evaluated_scores), axis=1)
+        return (fitness_scores / len(self.legal_moves), best_move_indices, best_scores)
     
     def evaluate_move(self, move):
-        new_board = self.board.copy()
-        old_board = self.board.copy()
-        make_move(new_board, move, "X")
-        
-        num_corner_score = self.num_corners_controlled(old_board, "X")
-        two_in_a_row_score = self.two_in_a_row(old_board)
-        middle_score = self.middle(old_board)
-
-        initial_score = (
-            self.weights[0] * num_corner_score +
-            self.weights[1] * two_in_a_row_score +
-            self.weights[2] * middle_score 
-        )
-
-        num_corner_score = self.num_corners_controlled(new_board, "X")
-        two_in_a_row_score = self.two_in_a_row(new_board)
-        middle_score = self.middle(new_board)
-        winning_move = self.winning_move(new_board, move)
-        blocking_win = self.blocking_win(new_board, move)
-        forking_move = self.forking_move(new_board, move)
-        blocking_fork = self.blocking_fork(new_board, move)
-        creating_fork_for_next_move = self.creating_fork_for_next_move(new_board, move)
-
-
-        final_score = (
-            self.weights[0] * num_corner_score +
-            self.weights[1] * two_in_a_row_score +
-            self.weights[2] * middle_score + 
-            self.weights[3] * winning_move +
-            self.weights[4] * blocking_win +
-            self.weights[5] * forking_move +
-            self.weights[6] * blocking_fork +
-            self.weights[7] * creating_fork_for_next_move
-        )
-
-        
-        return final_score - initial_score
+        return np.dot(self.move_features[self.legal_moves.index(move)], self.weights)
+
+    # Difference in each weighted quantity between the board before and after the move
+    def compute_move_features(self, move):
+        move_mask = CELL_MASKS[move]
+        new_x_mask = self.x_mask | move_mask
+
+        return [
+            self.num_corners_controlled(new_x_mask) - self.num_corners_controlled(self.x_mask),
+            self.two_in_a_row(new_x_mask) - self.two_in_a_row(self.x_mask),
+            self.middle(new_x_mask) - self.middle(self.x_mask),
+            self.winning_move(move_mask),
+            self.blocking_win(move_mask),
+            self.forking_move(move_mask),
+            self.blocking_fork(move_mask),
+            self.creating_fork_for_next_move(move_mask),
+        ]
     
     # ~~~~~~~~~~~~~~~ BOARD STATES ~~~~~~~~~~~~~~~
-    # These evaluations are done on the board both before and after the move
-    def num_corners_controlled(self, board, player):
-        conditions = [0, 2, 6, 8]
-        return len([corner for corner in conditions if board[corner] == player])
+    # These evaluations are done on the X mask both before and after the move
+    def num_corners_controlled(self, mask):
+        return CORNER_COUNT[mask]
     
-    def two_in_a_row(self, board):
-        conditions = [(0, 1), (1, 2), (0, 3), (2, 5), (3, 6), (5, 8), (6, 7), (7, 8), (1, 4), (3, 4), (4, 5), (4, 7)]
-        return len([two_in_a_row for two_in_a_row in conditions if board[two_in_a_row[0]] == "X" and board[two_in_a_row[1]] == "X"])
+    def two_in_a_row(self, x_mask):
+        return TWO_IN_A_ROW_COUNT[x_mask]
     
-    def middle(self, board):
-        return board[4] == "X"
+    def middle(self, x_mask):
+        return bool(x_mask & MIDDLE_MASK)
     
     # ~~~~~~~~~~~~~~~ MOVE CLASSIFICATION ~~~~~~~~~~~~~~~
-    # When necessary, these functions will be given old and new boards to compute
-    def winning_move(self, new_board, move):
-        if check_winner(new_board) == "X":
-            undo_move(new_board, move)
-            if check_winner(new_board) is None:
-                make_move(new_board, move, "X")
-                return True
-            make_move(new_board, move, "X")
-        
-        return False
+    # These are given the mask of the move and compare the board with and without it
+    def winning_move(self, move_mask):
+        return IS_WIN[self.x_mask | move_mask] and mask_winner(self.x_mask, self.o_mask) is None
     
-    def blocking_win(self, new_board, move):
+    def blocking_win(self, move_mask):
         # only evaluate if 0 is prevented from winning
-        if check_winner(new_board) is None or check_winner(new_board) == "X":
-            undo_move(new_board, move)
-            make_move(new_board, move, "O")
-            if check_winner(new_board) == "O":
-                undo_move(new_board, move)
-                make_move(new_board, move, "X")
-                return True
-            else:
-                undo_move(new_board, move)
-                make_move(new_board, move, "X")
-                return False
+        if mask_winner(self.x_mask | move_mask, self.o_mask) in (None, "X"):
+            # O would have won by playing the same cell
+            return mask_winner(self.x_mask, self.o_mask | move_mask) == "O"
             
         return False
     
-    def forking_move(self, new_board, move):
-        fork_conditions = [(0, 2, 6), (2, 6, 8), (0, 2, 8), (0, 6, 8)]
-        corners = [0, 2, 6, 8]
-        if move not in corners:
+    def forking_move(self, move_mask):
+        if not move_mask & CORNER_MASK:
             return False
-        # If fork exists, remove move and make sure fork did not exist prior to it
-        if any(new_board[a] == new_board[b] == new_board[c] == "X" for a, b, c in fork_conditions):
-            undo_move(new_board, move)
-            if not any(new_board[a] == new_board[b] == new_board[c] == "X" for a, b, c in fork_conditions):
-                make_move(new_board, move, "X")
-                return True
-            else:
-                make_move(new_board, move, "X")
-                return False
-            
-        return False
+        # The fork has to be created by the move
+        return HAS_FORK[self.x_mask | move_mask] and not HAS_FORK[self.x_mask]
     
-    def blocking_fork(self, new_board, move):
-        fork_conditions = [(0, 2, 6), (2, 6, 8), (0, 2, 8), (0, 6, 8)]
-        corners = [0, 2, 6, 8]
-        if move not in corners:
-            return False
-        # Place 0 where latest move occured, if fork exists, then move made blocked a fork
-        undo_move(new_board, move)
-        make_move(new_board, move, "0")
-        if any(new_board[a] == new_board[b] == new_board[c] == "O" for a, b, c in fork_conditions):
-            undo_move(new_board, move)
-            make_move(new_board, move, "X")
-            return True
-        else:
-            undo_move(new_board, move)
-            make_move(new_board, move, "X")
+    def blocking_fork(self, move_mask):
+        if not move_mask & CORNER_MASK:
             return False
+        # The move's cell is never counted for O, so this only finds forks O already has
+        return HAS_FORK[self.o_mask]
         
 
-    def creating_fork_for_next_move(self, new_board, move):
-        fork_conditions = [(0, 2, 6), (2, 6, 8), (0, 2, 8), (0, 6, 8)]
-        corners = [0, 2, 6, 8]
-        if move not in corners:
+    def creating_fork_for_next_move(self, move_mask):
+        if not move_mask & CORNER_MASK:
             return False
         
         # If O controls 1 or less corners and X now controls 2 corners after the move, then move creates a fork for next move
-        return self.num_corners_controlled(new_board, "O") <= 1 and self.num_corners_controlled(new_board, "X") == 2
+        return self.num_corners_controlled(self.o_mask) <= 1 and self.num_corners_controlled(self.x_mask | move_mask) == 2
             
 
     # ****************** SQUARE BASED EVALUATION ******************
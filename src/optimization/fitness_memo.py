@@ -0,0 +1,94 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from src.game.base_game import BaseGame
+
+
+class FitnessMemo:
+    """Bounded LRU memo of fitness results keyed by the position and the exact weight vector.
+
+    Results of `fitness` and of the rows of `fitness_batch` are kept apart, since a single set of
+    weights isn't always scored to the last bit the same way as a row of a larger batch. Once
+    `max_entries` is reached the least recently used results are evicted.
+    """
+
+    def __init__(self, max_entries=100_000):
+        self.max_entries = max_entries
+
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, kind: str, position_key, weights):
+        return (kind, position_key, np.asarray(weights, dtype=float).tobytes())
+
+    def get(self, key):
+        result = self.entries.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return result
+
+    def put(self, key, result):
+        self.entries[key] = result
+        self.entries.move_to_end(key)
+        while self.max_entries is not None and len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def fitness(self, game: BaseGame):
+        """Same as `game.fitness()`, computed only the first time the position is scored with these weights."""
+        key = self.key("fitness", game.position_key(), game.get_weights())
+        result = self.get(key)
+        if result is None:
+            result = game.fitness()
+            self.put(key, result)
+        return result
+
+    def fitness_batch(self, game: BaseGame, weights, evaluate=None):
+        """Same as `game.fitness_batch(weights)`, only the rows that haven't been scored on the position yet
+        are evaluated, together with `evaluate` (`game.fitness_batch` by default)."""
+        weights = np.asarray(weights, dtype=float)
+        position_key = game.position_key()
+        keys = [self.key("batch", position_key, row) for row in weights]
+        results = [self.get(key) for key in keys]
+
+        # Rows with the same weights are only evaluated once
+        missing_rows = {}
+        for row, (key, result) in enumerate(zip(keys, results)):
+            if result is None:
+                missing_rows.setdefault(key, row)
+        if missing_rows:
+            evaluate = evaluate if evaluate is not None else game.fitness_batch
+            computed = dict(zip(missing_rows, zip(*evaluate(weights[list(missing_rows.values())]))))
+            for key, result in computed.items():
+                self.put(key, result)
+            results = [result if result is not None else computed[key] for key, result in zip(keys, results)]
+
+        return tuple(np.array(column) for column in zip(*results))
+
+    def counters(self):
+        """(hits, misses) so far, to report the lookups of a single run with `since`."""
+        return (self.hits, self.misses)
+
+    def hit_rate(self, since=(0, 0)):
+        hits, misses = self.hits - since[0], self.misses - since[1]
+        lookups = hits + misses
+        return hits / lookups if lookups > 0 else 0.0
+
+    def report(self, since=(0, 0)):
+        hits, misses = self.hits - since[0], self.misses - since[1]
+        return f"Fitness memo hit rate: {self.hit_rate(since):.1%} ({hits} hits, {misses} misses, {len(self.entries)} entries)"
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+# Shared by every optimizer so fitness already computed on a position is reused across runs. Simulated
+# annealing only uses it when it's passed explicitly
+shared_fitness_memo = FitnessMemo()
@@ -1,8 +1,12 @@
 import random
+import numpy as np
 from src.utility.chess_extraction import extract_random_chess_positions
 from src.utility.othello_extraction import extract_random_othello_positions
 from src.utility.game_chooser import create_base_game
 from src.game.base_game import BaseGame
+from src.optimization.parallel_evaluation import PopulationEvaluator
+from src.optimization.fitness_memo import shared_fitness_memo
+from src.optimization.genome import Genome
 import matplotlib.pyplot as plt
 
 from colorama import Fore, Back, Style
@@ -10,7 +14,7 @@ from colorama import Fore, Back, Style
 from src.utility.ttt_extraction import extract_random_ttt_positions
 
 class GeneticAlgorithm:
-    def __init__(self, game_name, population_size=10, mutation_rate=0, seed=None):
+    def __init__(self, game_name, population_size=10, mutation_rate=0, seed=None, num_workers=1, chunk_size=None, fitness_memo=None, sampler=None, resample_every=None):
         self.history = []  
         self.weight_history = []  
         self.weight_labels = []
@@ -20,7 +24,23 @@ class GeneticAlgorithm:
         self.game_name = game_name
         self.population_size = population_size
         self.mutation_rate = mutation_rate
-        self.population = self.initialize_population()
+        # The population is evaluated in chunks of chunk_size individuals, split over num_workers processes.
+        # The results are the same for any number of workers with the same chunk size
+        self.num_workers = num_workers
+        self.chunk_size = chunk_size
+        # Individuals that survive or are recreated with the same weights aren't evaluated again
+        self.fitness_memo = fitness_memo if fitness_memo is not None else shared_fitness_memo
+        # The memo is shared between runs, only the lookups from here on are reported for this run
+        self.memo_counters = self.fitness_memo.counters()
+        # With a sampler the fitness is the mean over a mini-batch of positions, a new mini-batch
+        # is drawn every resample_every generations
+        self.sampler = sampler
+        self.resample_every = resample_every
+        # Every individual shares the same board, so the first game is kept as the context of the run
+        # and each individual is only its weights
+        initial_games = self.initialize_population()
+        self.context = initial_games[0]
+        self.population = [Genome(game.get_weights(), self.context) for game in initial_games]
 
     def plot_evolution_history(self):
         history = self.history
@@ -78,7 +98,9 @@ class GeneticAlgorithm:
         plt.show()
 
     def initialize_population(self):
-        if self.game_name == "chess":
+        if self.sampler is not None:
+            return self.sampler.initial_games(self.population_size)
+        elif self.game_name == "chess":
             # Individuals in the population each start with the same random position.
             # Their chromosomes are made up of genes representing fitness function weights
             board_data = extract_random_chess_positions(num_positions=1, seed=self.seed)[0]
@@ -97,42 +119,56 @@ class GeneticAlgorithm:
         else:
             raise ValueError("Invalid game name. Supported options: chess, othello, go")
 
-    def mutate(self, game):
+    def mutate(self, genome):
         # Randomly choose 1 weights to mutate
-        weights = game.get_weights()
-        weight_bounds = game.get_weight_bounds()
+        weights = genome.weights
+        weight_bounds = self.context.get_weight_bounds()
 
         weight_indices = random.sample(range(len(weights)), 1)
         for weight_idx in weight_indices:
             weights[weight_idx] = random.uniform(float(weight_bounds[weight_idx][0]), float(weight_bounds[weight_idx][1]))
-        
-        game.update_weights(weights)
 
-    def crossover(self, game1, game2):
+    def crossover(self, genome1, genome2):
         child_weights = []
         
-        weights1 = game1.get_weights()
-        weights2 = game2.get_weights()
+        weights1 = genome1.weights
+        weights2 = genome2.weights
 
         for idx in range(len(weights1)):
             # Randomly choose weights from either parent
             child_weights.append(random.choice([weights1[idx], weights2[idx]]))
 
-        # Create a new ChessGame instance for the child
-        board_data = game1.get_board_data()
-        child_game = create_base_game(self.game_name, board_data)
-        child_game.update_weights(child_weights)
-        return child_game
+        # The child shares the board of its parents
+        return Genome(child_weights, self.context)
 
     def evolve(self, generations, target_fitness=None) -> BaseGame:
+        # The workers only need the shared context
+        with PopulationEvaluator(self.context, self.num_workers, self.chunk_size) as evaluator:
+            best_individual = self.run_generations(evaluator, generations, target_fitness)
+        print(self.fitness_memo.report(since=self.memo_counters))
+        return best_individual.to_game()
+
+    def resample(self, evaluator):
+        # The population carries its weights over to the next mini-batch
+        self.context = self.sampler.next_game()
+        for individual in self.population:
+            individual.context = self.context
+        evaluator.reset(self.context)
+
+    def run_generations(self, evaluator, generations, target_fitness=None) -> Genome:
         for generation in range(generations):
+            if self.sampler is not None and self.resample_every and generation > 0 and generation % self.resample_every == 0:
+                self.resample(evaluator)
+
             fitness_scores = []
-            # Evaluate the fitness scores of each individual in the population
-            for individual in self.population:
-                fitness_score, best_move, best_score = individual.fitness()
+            # Evaluate the fitness scores of the whole population at once since every individual shares the same board
+            population_weights = np.array([individual.weights for individual in self.population])
+            population_fitness = self.fitness_memo.fitness_batch(self.context, population_weights, evaluator.evaluate)
+            legal_moves = self.context.get_legal_moves()
+            for individual, fitness_score, best_move_idx, best_score in zip(self.population, *population_fitness):
+                best_move = legal_moves[best_move_idx] if best_move_idx >= 0 else None
                 fitness_scores.append((individual, (fitness_score, best_move, best_score)))
 
-
             # Sort to get the top fitness scores for the next generation
             fitness_scores.sort(key=lambda x: x[1][0], reverse=True)
             best_individual, best_fitness_data = fitness_scores[0]
@@ -161,7 +197,7 @@ class GeneticAlgorithm:
 
             self.population = new_population
 
-            best_move_rank = best_individual.rank_move(best_move)
+            best_move_rank = self.context.rank_move(best_move)
 
             self.history.append({
                 "best_fitness": best_fitness_score,
@@ -174,6 +210,6 @@ class GeneticAlgorithm:
             if (generation + 1) % 10 == 0:
                 print(f"Generation {generation + 1}: Best Fitness: {best_fitness_score} Best Move Rank: {best_move_rank}")
 
-        self.weight_labels = best_individual.get_weight_labels()
-        self.weight_bounds = best_individual.get_weight_bounds()
+        self.weight_labels = self.context.get_weight_labels()
+        self.weight_bounds = self.context.get_weight_bounds()
         return best_individual
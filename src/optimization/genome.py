@@ -0,0 +1,25 @@
+import numpy as np
+
+from src.game.base_game import BaseGame
+
+
+class Genome:
+    """Weights of one individual of an optimizer.
+
+    Every genome of a run points to the same game, which holds the position and everything
+    precomputed from it. A genome only owns its weight vector, so creating one is an array copy.
+    """
+
+    __slots__ = ("weights", "context")
+
+    def __init__(self, weights, context: BaseGame):
+        self.weights = np.array(weights, dtype=float)
+        self.context = context
+
+    def get_weights(self) -> list[float]:
+        return self.weights.tolist()
+
+    def to_game(self) -> BaseGame:
+        """The shared game with this genome's weights."""
+        self.context.update_weights(self.weights.tolist())
+        return self.context
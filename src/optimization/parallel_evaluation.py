@@ -0,0 +1,117 @@
+import os
+import math
+import pickle
+import shutil
+import tempfile
+import multiprocessing
+
+import numpy as np
+
+from src.game.base_game import BaseGame
+
+# Evaluation context each worker evaluates the weights on and the file it was read from
+worker_context = None
+worker_context_path = None
+
+
+def game_classes(game: BaseGame) -> list[type]:
+    # A batch of positions is also evaluated with the settings of the games it holds
+    return [type(game)] + [type(position) for position in getattr(game, "games", [])]
+
+
+def load_context(context_path: str) -> None:
+    global worker_context, worker_context_path
+    if context_path == worker_context_path:
+        return
+
+    with open(context_path, "rb") as context_file:
+        class_settings, context = pickle.load(context_file)
+    # Workers that don't fork start with the default class settings (e.g. OthelloGame.SYMMETRIC)
+    for game_class, settings in class_settings.items():
+        for name, value in settings.items():
+            setattr(game_class, name, value)
+    worker_context, worker_context_path = context, context_path
+
+
+def evaluate_chunk(task):
+    context_path, weights = task
+    load_context(context_path)
+    return worker_context.fitness_batch(weights)
+
+
+class PopulationEvaluator:
+    """Evaluates the fitness of many sets of weights on the same board, split over a process pool.
+
+    Only the game's evaluation context is sent to the workers. It is written to a file that each
+    worker reads once, after that only the weight chunks and their fitness arrays are sent. Moving
+    to another game writes a new file and keeps the same workers. The weights are always split into
+    chunks of `chunk_size` rows, also without workers, so the results only depend on the chunk size
+    and are bit-identical for any number of workers. Without a chunk size the weights are split
+    evenly over the workers, then the results can differ between numbers of workers in the last bits.
+    """
+
+    def __init__(self, game: BaseGame, num_workers=1, chunk_size=None):
+        self.game = game
+        self.num_workers = num_workers
+        self.chunk_size = chunk_size
+        self.pool = None
+
+        self.context_dir = None
+        self.context_path = None
+        self.num_contexts = 0
+
+    def start(self):
+        if self.pool is None and self.num_workers > 1:
+            self.context_dir = tempfile.mkdtemp(prefix="population_evaluator_")
+            self.pool = multiprocessing.Pool(self.num_workers)
+            self.publish_context()
+
+    def publish_context(self):
+        # Upper case class attributes are the game's settings
+        class_settings = {
+            game_class: {name: value for name, value in vars(game_class).items() if name.isupper()}
+            for game_class in game_classes(self.game)
+        }
+        context_path = os.path.join(self.context_dir, f"context_{self.num_contexts}.pkl")
+        with open(context_path, "wb") as context_file:
+            pickle.dump((class_settings, self.game.evaluation_context()), context_file)
+
+        # Every chunk of the previous context has already been evaluated
+        if self.context_path is not None:
+            os.remove(self.context_path)
+        self.context_path = context_path
+        self.num_contexts += 1
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+            shutil.rmtree(self.context_dir, ignore_errors=True)
+            self.context_dir = None
+            self.context_path = None
+
+    def reset(self, game: BaseGame):
+        """Evaluate on another game from now on, the running workers load it with their next chunk."""
+        self.game = game
+        if self.pool is not None:
+            self.publish_context()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def evaluate(self, weights):
+        """Same result as `game.fitness_batch(weights)` evaluated chunk by chunk."""
+        weights = np.asarray(weights, dtype=float)
+        chunk_size = self.chunk_size or math.ceil(len(weights) / self.num_workers)
+        chunks = [weights[start:start + chunk_size] for start in range(0, len(weights), chunk_size)]
+
+        if self.pool is not None:
+            results = self.pool.map(evaluate_chunk, [(self.context_path, chunk) for chunk in chunks])
+        else:
+            results = [self.game.fitness_batch(chunk) for chunk in chunks]
+        return tuple(np.concatenate(arrays) for arrays in zip(*results))
@@ -7,13 +7,13 @@ from src.utility.chess_extraction import extract_random_chess_positions
 from src.utility.othello_extraction import extract_random_othello_positions
 from src.utility.game_chooser import create_base_game
 from src.game.base_game import BaseGame
+from src.optimization.fitness_memo import shared_fitness_memo
 import matplotlib.pyplot as plt
-from copy import deepcopy
 
 from src.utility.ttt_extraction import extract_random_ttt_positions
 
 class PSO():
-    def __init__(self, game_name, num_particles=10, seed=None):
+    def __init__(self, game_name, num_particles=10, seed=None, fitness_memo=None, sampler=None, resample_every=None):
         self.history = []  
         self.weight_history = []  
         self.weight_labels = []
@@ -30,16 +30,29 @@ class PSO():
 
         self.game_name = game_name
         self.num_particles = num_particles
+        # The global best is scored every iteration and particles can return to weights already scored
+        self.fitness_memo = fitness_memo if fitness_memo is not None else shared_fitness_memo
+        # The memo is shared between runs, only the lookups from here on are reported for this run
+        self.memo_counters = self.fitness_memo.counters()
+        # Particles are scored on a mini-batch of positions from the sampler when there is one
+        self.sampler = sampler
+        self.resample_every = resample_every
         
         # Initalize particles and get best local and global particles.
-        self.particles = self.initialize_particles()
-        self.local_best = deepcopy(self.particles)
-        self.local_best_fitness = [particle.fitness()[0] for particle in self.local_best]
-        
-        self.particle_momentums = [np.array([0 for j in range(len(particle.get_weights()))]) for particle in self.particles]
+        particles = self.initialize_particles()
+        # Every particle shares the same board, so a single game evaluates the whole swarm and is
+        # handed the weights of the global best when needed. The swarm itself is kept as
+        # (num particles, num weights) arrays
+        self.game = particles[0]
+        self.positions = np.array([particle.get_weights() for particle in particles], dtype=float)
+        self.particle_momentums = np.zeros_like(self.positions)
+
+        self.local_best = self.positions.copy()
+        self.local_best_fitness = self.evaluate_particles(self.local_best)[0]
         
         self.global_best = self.get_global_best()
-        self.global_best_fitness, _, _ = self.global_best.fitness()
+        # Scored in the same batches as the particles it is compared with
+        self.global_best_fitness = self.local_best_fitness.max()
         
         
     def initialize_particles(self) -> list[BaseGame]:
@@ -47,7 +60,9 @@ class PSO():
         Returns:
             list[BaseGame]: The list of games that are treated as particles.
         """
-        if self.game_name == "chess":
+        if self.sampler is not None:
+            return self.sampler.initial_games(self.num_particles)
+        elif self.game_name == "chess":
             # Individuals in the population each start with the same random position.
             # Their chromosomes are made up of genes representing fitness function weights
             board_data = extract_random_chess_positions(num_positions=1, seed=self.seed)[0]
@@ -121,79 +136,72 @@ class PSO():
         fig1.tight_layout()
         plt.show()
 
-    def get_global_best(self) -> BaseGame:
+    def evaluate_particles(self, weights: np.ndarray):
+        """Evaluate every particle in a single batch since they all share the same board.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray, np.ndarray]: Fitness, best move index and best score of each particle.
+        """
+        return self.fitness_memo.fitness_batch(self.game, weights)
+
+    def get_global_best(self) -> np.ndarray:
         """Get the global best of local bests.
 
         Returns:
-            BaseGame: Global best
+            np.ndarray: Weights of the global best
         """
-        best_fitness = -math.inf
-        global_best_idx = None
-        
-        # Loop through each local best particle and find the global best.
-        for idx, particle in enumerate(self.local_best):
-            fitness, _, _ = particle.fitness()
-            if fitness > best_fitness:
-                best_fitness = fitness
-                global_best_idx = idx
-                
-        return self.local_best[global_best_idx]
+        return self.local_best[int(np.argmax(self.local_best_fitness))].copy()
 
-    def iterate_particle(self, particle_id):
-        # Get local, global, and particle weights
-        local_best_weights = np.array(self.local_best[particle_id].get_weights())
-        local_best_fitness = self.local_best_fitness[particle_id]
-        
-        global_best_weights = np.array(self.global_best.get_weights())
-    
-        particle_weights = np.array(self.particles[particle_id].get_weights())
-        
+    def global_best_game(self) -> BaseGame:
+        """Game holding the weights of the global best."""
+        self.game.update_weights(list(self.global_best))
+        return self.game
+
+    def move_particles(self):
         # Calculate momentum based on the ECE457A definition of momentum.
-        momentum = self.a1*self.particle_momentums[particle_id] + self.a2*(local_best_weights-particle_weights) + self.a3*(global_best_weights-particle_weights)
+        momentums = self.a1*self.particle_momentums + self.a2*(self.local_best-self.positions) + self.a3*(self.global_best-self.positions)
         # Limit the momentum from becoming too large.
-        for i in range(len(momentum)):
-            if momentum[i] > self.momentum_limit:
-                momentum[i] = self.momentum_limit
-            elif momentum[i] < -self.momentum_limit:
-                momentum[i] = -self.momentum_limit
+        self.particle_momentums = np.clip(momentums, -self.momentum_limit, self.momentum_limit)
         
         # Update weights
-        next_weights = particle_weights + momentum
-        self.particles[particle_id].update_weights(list(next_weights))
-        
-        # Update momentum and check local best.
-        self.particle_momentums[particle_id] = momentum
-        
-        new_particle_fitness, _, _ = self.particles[particle_id].fitness()
-        if local_best_fitness < new_particle_fitness:
-            self.local_best[particle_id] = deepcopy(self.particles[particle_id])
-            self.local_best_fitness[particle_id] = new_particle_fitness
-            
-        if self.global_best_fitness < new_particle_fitness:
-            self.global_best = deepcopy(self.particles[particle_id])
-            self.global_best_fitness = new_particle_fitness
-        
-        
-        
+        self.positions = self.positions + self.particle_momentums
+
+    def update_bests(self):
+        # Evaluate the moved particles together and check the local and global bests.
+        particle_fitness = self.evaluate_particles(self.positions)[0]
+        improved = self.local_best_fitness < particle_fitness
+        self.local_best[improved] = self.positions[improved]
+        self.local_best_fitness[improved] = particle_fitness[improved]
+
+        # The first particle with the highest fitness, if it beats the global best
+        best_particle = int(np.argmax(particle_fitness))
+        if self.global_best_fitness < particle_fitness[best_particle]:
+            self.global_best = self.positions[best_particle].copy()
+            self.global_best_fitness = particle_fitness[best_particle]
+        
+    def resample(self):
+        # The bests found on the previous mini-batch are scored again on the new one
+        self.game = self.sampler.next_game()
+        self.local_best_fitness = self.evaluate_particles(self.local_best)[0]
+        self.global_best = self.get_global_best()
+        # Scored in the same batches as the particles it is compared with
+        self.global_best_fitness = self.local_best_fitness.max()
+
     def iterate(self, iterations, target_fitness=None) -> BaseGame:
         for i in range(iterations):
-            fitness_scores = []
-            # Evaluate the fitness scores of each individual in the population
-            for particle in self.particles:
-                fitness_score, best_move, best_score = particle.fitness()
-                fitness_scores.append((particle, (fitness_score, best_move, best_score)))
-               # print(f"Chosen Move: {best_move}. Evaluated Score: {best_score}. Fitnesss: {fitness_score}")
-                        
-            best_individual = self.global_best
-            best_fitness_score, best_move, best_score = self.global_best.fitness()
+            if self.sampler is not None and self.resample_every and i > 0 and i % self.resample_every == 0:
+                self.resample()
+
+            best_individual = self.global_best_game()
+            best_fitness_score, best_move, best_score = self.fitness_memo.fitness(best_individual)
 
             if target_fitness and best_fitness_score >= target_fitness:
                 print(f"Target fitness reached. Stopping evolution.")
                 break
 
-            # Perform PSO iteration.
-            for particle_idx in range(len(self.particles)):
-                self.iterate_particle(particle_idx)
+            # Perform PSO iteration. Every particle moves towards the bests from the start of the iteration.
+            self.move_particles()
+            self.update_bests()
 
             
             # # Parents are the best individuals in the population based on fitness
@@ -227,6 +235,7 @@ class PSO():
             print(f"\nIteration {i + 1}, Best Fitness: {best_fitness_score}, Best Move: {best_move} with rank: {best_move_rank}")
             print(f"Weights: {best_individual.get_weights()}\n")
 
+        print(self.fitness_memo.report(since=self.memo_counters))
         self.weight_labels = best_individual.get_weight_labels()
         self.weight_bounds = best_individual.get_weight_bounds()
         return best_individual
\ No newline at end of file
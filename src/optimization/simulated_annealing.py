@@ -6,11 +6,15 @@ from src.utility.chess_extraction import extract_random_chess_positions
 from src.utility.othello_extraction import extract_random_othello_positions
 from src.utility.ttt_extraction import extract_random_ttt_positions
 from src.utility.game_chooser import create_base_game
+from src.optimization.fitness_memo import FitnessMemo
 import matplotlib.pyplot as plt
 from math import e
 
+# Size of the memo a run keeps when it isn't given one
+SA_MEMO_ENTRIES = 1_000
+
 class SimulatedAnnealing:
-    def __init__(self, game_name, temperature=1, seed=None):
+    def __init__(self, game_name, temperature=1, seed=None, fitness_memo=None, sampler=None, resample_every=None):
         self.history = []  
         self.weight_history = []  
         self.weight_labels = []
@@ -18,10 +22,19 @@ class SimulatedAnnealing:
 
         self.game_name = game_name
         self.temperature = temperature
+        # A step rarely returns to weights that were already scored, so by default the candidate is
+        # memoized in a small memo of its own instead of filling the shared one
+        self.fitness_memo = fitness_memo if fitness_memo is not None else FitnessMemo(max_entries=SA_MEMO_ENTRIES)
+        self.memo_counters = self.fitness_memo.counters()
+        # The candidate can be scored on mini-batches from a sampler instead of a single board
+        self.sampler = sampler
+        self.resample_every = resample_every
         self.candidate = self.initialize_candidate()
         
     def initialize_candidate(self):
-        if self.game_name == "chess":
+        if self.sampler is not None:
+            return self.sampler.next_game()
+        elif self.game_name == "chess":
             # Getting a random position
             board_data = extract_random_chess_positions(num_positions=1, seed=self.seed)[0]
             # Create the candidate given the set of initial individuals
@@ -120,18 +133,28 @@ class SimulatedAnnealing:
         cur_temp = self.temperature
 
         counter = 0
-        cur_fitness_score, cur_best_move, cur_best_score = self.candidate.fitness()
+        cur_fitness_score, cur_best_move, cur_best_score = self.fitness_memo.fitness(self.candidate)
         best_fitness_score, best_best_move, best_best_score, best_best_move_rank = cur_fitness_score, cur_best_move, cur_best_score, self.candidate.rank_move(cur_best_move)
         best_weights = self.candidate.get_weights()
         
         while cur_temp >= 10**(-100):            
             for _ in range(iterations_per_temp):
+                if self.sampler is not None and self.resample_every and counter > 0 and counter % self.resample_every == 0:
+                    # The best and the current weights are both scored again on the new mini-batch,
+                    # so new candidates aren't compared against scores from another mini-batch
+                    cur_weights = self.candidate.get_weights()
+                    self.candidate = self.sampler.next_game()
+                    self.candidate.update_weights(best_weights)
+                    best_fitness_score, best_best_move, best_best_score = self.fitness_memo.fitness(self.candidate)
+                    best_best_move_rank = self.candidate.rank_move(best_best_move)
+                    self.candidate.update_weights(cur_weights)
+                    cur_fitness_score, cur_best_move, cur_best_score = self.fitness_memo.fitness(self.candidate)
                 counter += 1
                 cur_weights = self.candidate.get_weights()
                 next_candidate_weights = self.get_random_weight_neighbour()  
                 
                 self.candidate.update_weights(next_candidate_weights)
-                fitness_score, best_move, best_score = self.candidate.fitness()
+                fitness_score, best_move, best_score = self.fitness_memo.fitness(self.candidate)
                 
                 if target_fitness and best_fitness_score >= target_fitness:
                     print(f"Target fitness reached. Stopping evolution.")
@@ -168,6 +191,7 @@ class SimulatedAnnealing:
             
             cur_temp = self.decrease_temp_geometrically(cur_temp, 0.95)
 
+        print(self.fitness_memo.report(since=self.memo_counters))
         self.weight_labels = self.candidate.get_weight_labels()
         self.weight_bounds = self.candidate.get_weight_bounds()
         return self.candidate
@@ -0,0 +1,101 @@
+import os
+import json
+import sqlite3
+import threading
+
+import chess
+import chess.engine
+
+DEFAULT_STORE_PATH = "./cache/stockfish_analysis.sqlite"
+
+
+def score_to_json(score: chess.engine.PovScore):
+    relative = score.relative
+    if relative == chess.engine.MateGiven:
+        value = {"mate_given": True}
+    elif relative.is_mate():
+        value = {"mate": relative.mate()}
+    else:
+        value = {"cp": relative.score()}
+    value["turn"] = score.turn
+    return value
+
+
+def score_from_json(value) -> chess.engine.PovScore:
+    if value.get("mate_given"):
+        relative = chess.engine.MateGiven
+    elif "mate" in value:
+        relative = chess.engine.Mate(value["mate"])
+    else:
+        relative = chess.engine.Cp(value["cp"])
+    return chess.engine.PovScore(relative, value["turn"])
+
+
+def move_sequences_to_json(move_sequences):
+    serialized = {}
+    for move, sequence in move_sequences.items():
+        if move == 'stockfish':
+            serialized[move] = {'score': score_to_json(sequence['score']), 'move': sequence['move'].uci()}
+        else:
+            serialized[move] = {'score': score_to_json(sequence['score']), 'next_moves': [next_move.uci() for next_move in sequence['next_moves']]}
+    return serialized
+
+
+def move_sequences_from_json(serialized):
+    move_sequences = {}
+    for move, sequence in serialized.items():
+        if move == 'stockfish':
+            move_sequences[move] = {'score': score_from_json(sequence['score']), 'move': chess.Move.from_uci(sequence['move'])}
+        else:
+            move_sequences[move] = {'score': score_from_json(sequence['score']), 'next_moves': [chess.Move.from_uci(next_move) for next_move in sequence['next_moves']]}
+    return move_sequences
+
+
+class AnalysisStore:
+    """Persistent store of Stockfish analyses keyed by FEN and the limits the analysis was run with.
+
+    Failed analyses aren't stored since engine failures are often transient, the position is
+    searched again the next time it is needed.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS analyses ("
+                "fen TEXT NOT NULL, limits TEXT NOT NULL, move_sequences TEXT NOT NULL, ranked_moves TEXT NOT NULL, "
+                "PRIMARY KEY (fen, limits))"
+            )
+
+    def get(self, fen, limits):
+        """Returns the stored (move_sequences, ranked_moves) or None if the position hasn't been
+        analysed with these limits."""
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT move_sequences, ranked_moves FROM analyses WHERE fen = ? AND limits = ?", (fen, limits)
+            ).fetchone()
+
+        if row is None:
+            return None
+        move_sequences, ranked_moves = row
+        return (move_sequences_from_json(json.loads(move_sequences)), json.loads(ranked_moves))
+
+    def put(self, fen, limits, move_sequences, ranked_moves):
+        if move_sequences is None or ranked_moves is None:
+            return
+        values = (fen, limits, json.dumps(move_sequences_to_json(move_sequences)), json.dumps(ranked_moves))
+
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO analyses (fen, limits, move_sequences, ranked_moves) VALUES (?, ?, ?, ?)", values
+            )
+
+    def close(self):
+        self.connection.close()
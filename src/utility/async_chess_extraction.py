@@ -0,0 +1,198 @@
+import os
+import random
+import asyncio
+
+import chess
+import chess.engine
+
+from src.game.chess.eval_count_cache import shared_eval_count_cache
+from src.utility.engine_pool import STOCKFISH_PATH, DEFAULT_ENGINE_OPTIONS
+from src.utility.chess_extraction import (
+    ANALYSIS_MODES,
+    DEFAULT_ANALYSIS_MODE,
+    MULTIPV_LIMIT,
+    STOCKFISH_LIMITS,
+    get_analysis_store,
+    load_pgn_index,
+    multipv_move_infos,
+    rank_move_infos,
+    root_move_searches,
+    sample_random_position,
+)
+
+# Number of times an engine that crashed mid-analysis is restarted before giving up on a position
+MAX_ENGINE_RESTARTS = 2
+
+
+async def start_engine(engine_path=STOCKFISH_PATH, options=None):
+    options = DEFAULT_ENGINE_OPTIONS if options is None else options
+    _, engine = await chess.engine.popen_uci(engine_path)
+    # Only configure the options this engine understands
+    await engine.configure({name: value for name, value in options.items() if name in engine.options})
+    return engine
+
+
+async def quit_engine(engine):
+    try:
+        await engine.quit()
+    except (chess.engine.EngineError, chess.engine.EngineTerminatedError):
+        pass
+
+
+# Evaluate the score of every legal move with one search per move
+async def analyse_root_moves(board, engine):
+    searches = root_move_searches(board)
+    info = None
+    try:
+        while True:
+            move, limit = searches.send(info)
+            info = await engine.analyse(board, limit, root_moves=[move])
+    except StopIteration as result:
+        return result.value
+
+
+# Evaluate the score of every legal move with a single MultiPV search
+async def analyse_multipv(board, engine, limit):
+    legal_moves = list(board.legal_moves)
+    infos = await engine.analyse(board, limit, multipv=len(legal_moves))
+    return multipv_move_infos(legal_moves, infos)
+
+
+async def run_stockfish_evaluation(board, engine, analysis_mode):
+    if analysis_mode == "multipv":
+        move_infos = await analyse_multipv(board, engine, MULTIPV_LIMIT)
+    else:
+        move_infos = await analyse_root_moves(board, engine)
+    return rank_move_infos(move_infos)
+
+
+class ConcurrentLabeller:
+    """Labels chess positions with several engine processes at once.
+
+    At most `concurrency` positions are analysed at the same time, one per engine. Results
+    go through the same analysis store as the synchronous labelling, so positions labelled
+    here are reused by extract_random_chess_positions and the other way around.
+    """
+
+    def __init__(self, analysis_mode=DEFAULT_ANALYSIS_MODE, concurrency=None, engine_path=STOCKFISH_PATH):
+        if analysis_mode not in ANALYSIS_MODES:
+            raise ValueError(f"Unknown analysis mode: {analysis_mode}")
+
+        self.analysis_mode = analysis_mode
+        self.concurrency = concurrency or os.cpu_count() or 1
+        self.engine_path = engine_path
+
+        self.store = get_analysis_store()
+        self.game_offsets = load_pgn_index()
+        self.engines = None
+
+    async def start(self):
+        # Idle engines wait in the queue. Engines are only started when a position isn't in the
+        # store, at most `concurrency` of them
+        self.engines = asyncio.Queue()
+        self.num_engines = 0
+
+    async def acquire_engine(self):
+        if self.engines.empty() and self.num_engines < self.concurrency:
+            self.num_engines += 1
+            try:
+                return await start_engine(self.engine_path)
+            except Exception:
+                self.num_engines -= 1
+                raise
+        return await self.engines.get()
+
+    async def close(self):
+        while not self.engines.empty():
+            await quit_engine(self.engines.get_nowait())
+
+    async def evaluate(self, board):
+        # Evaluate the score of every legal move, reusing the stored analysis if the position was seen before
+        limits = STOCKFISH_LIMITS[self.analysis_mode]
+        stored_analysis = self.store.get(board.fen(), limits)
+        if stored_analysis is not None:
+            return stored_analysis
+
+        engine = await self.acquire_engine()
+        try:
+            for restart in range(MAX_ENGINE_RESTARTS + 1):
+                try:
+                    (move_sequences, ranked_moves) = await run_stockfish_evaluation(board, engine, self.analysis_mode)
+                    break
+                except chess.engine.EngineTerminatedError:
+                    # The engine crashed, close it and search the position again with a new one
+                    crashed_engine, engine = engine, None
+                    await quit_engine(crashed_engine)
+                    if restart == MAX_ENGINE_RESTARTS:
+                        raise
+                    engine = await start_engine(self.engine_path)
+        finally:
+            if engine is not None:
+                self.engines.put_nowait(engine)
+            else:
+                # Its place can be taken by a new engine
+                self.num_engines -= 1
+
+        self.store.put(board.fen(), limits, move_sequences, ranked_moves)
+        return (move_sequences, ranked_moves)
+
+    async def label(self, seed):
+        # Returns the board data for the position sampled with this seed or None if it couldn't be labelled
+        (board, board_moves) = sample_random_position(self.game_offsets, seed)
+        (move_sequences, ranked_moves) = await self.evaluate(board)
+
+        if move_sequences is None or ranked_moves is None:
+            return None
+        return (board, board_moves, move_sequences, ranked_moves, shared_eval_count_cache)
+
+    async def label_seeds(self, seeds):
+        return await asyncio.gather(*[self.label(seed) for seed in seeds])
+
+    async def extract_positions(self, num_positions, seed):
+        # Position i is sampled with seed + i. If it can't be labelled it's replaced by the position
+        # for seed + i + num_positions, seed + i + 2 * num_positions, ... so no seed is used twice
+        async def label_position(position):
+            attempt_seed = seed + position
+            while True:
+                board_data = await self.label(attempt_seed)
+                if board_data is not None:
+                    return board_data
+                attempt_seed += num_positions
+
+        return await asyncio.gather(*[label_position(position) for position in range(num_positions)])
+
+
+async def run_labeller(labeller, labelling):
+    await labeller.start()
+    try:
+        return await labelling()
+    finally:
+        await labeller.close()
+
+
+def extract_random_chess_positions_concurrently(num_positions, seed=None, analysis_mode=DEFAULT_ANALYSIS_MODE, concurrency=None):
+    """Concurrent version of extract_random_chess_positions.
+
+    Returns `num_positions` labelled positions in seed order, position i is sampled with
+    seed + i (or a later seed if that position couldn't be labelled).
+    """
+    if seed is None:
+        seed = random.randint(0, 1000000)
+
+    labeller = ConcurrentLabeller(analysis_mode, min(concurrency or os.cpu_count() or 1, num_positions))
+    return asyncio.run(run_labeller(labeller, lambda: labeller.extract_positions(num_positions, seed)))
+
+
+def warm_analysis_store(seeds, analysis_mode=DEFAULT_ANALYSIS_MODE, concurrency=None):
+    """Labels the positions for every seed concurrently so later extract_random_chess_positions
+    calls with these seeds are answered from the analysis store.
+
+    Returns the number of seeds whose position couldn't be labelled.
+    """
+    seeds = list(seeds)
+    if not seeds:
+        return 0
+
+    labeller = ConcurrentLabeller(analysis_mode, min(concurrency or os.cpu_count() or 1, len(seeds)))
+    results = asyncio.run(run_labeller(labeller, lambda: labeller.label_seeds(seeds)))
+    return sum(board_data is None for board_data in results)
@@ -1,47 +1,145 @@
+import os
+import json
 import time
 import random
 import chess
 
 from tqdm import tqdm
 from chess import engine, pgn
+from src.game.chess.eval_count_cache import shared_eval_count_cache
+from src.utility.analysis_store import AnalysisStore
+from src.utility.engine_pool import get_engine_pool
 
-# Evaluate the score of every legal move (and get the next best move)
-def stockfish_evaluation(board):
-    two_ply_moves = 8
+# Number of principal variation moves kept for every root move
+PV_LENGTH = 16
 
-    engine = chess.engine.SimpleEngine.popen_uci("./stockfish")
-    move_sequences = {}
-    total_moves = len(list(board.legal_moves))
-    best_moves_ascending = []
+# "root_moves" runs a separate search restricted to each legal move, "multipv" scores every
+# legal move with a single search that reports one principal variation per root move
+ANALYSIS_MODES = ("root_moves", "multipv")
+DEFAULT_ANALYSIS_MODE = "root_moves"
+# A single search budget for the whole position. The lines of a MultiPV search can be shorter
+# than PV_LENGTH, the move features are computed at the end of whatever line the search reports
+MULTIPV_LIMIT = chess.engine.Limit(time=5, depth=20)
+
+# Identifies the analysis each mode performs in the analysis store.
+# Change it whenever the analysis changes so stale results aren't reused.
+STOCKFISH_LIMITS = {
+    "root_moves": "root_moves;depth=20;time=1+0.1..5;pv=16",
+    "multipv": "multipv;depth=20;time=5;pv<=16",
+}
+
+analysis_store = None
+
+def get_analysis_store():
+    global analysis_store
+    if analysis_store is None:
+        analysis_store = AnalysisStore()
+    return analysis_store
+
+# Evaluate the score of every legal move, reusing the stored analysis if the position was seen before
+def stockfish_evaluation(board, analysis_mode=DEFAULT_ANALYSIS_MODE):
+    if analysis_mode not in ANALYSIS_MODES:
+        raise ValueError(f"Unknown analysis mode: {analysis_mode}")
+
+    store = get_analysis_store()
+    stored_analysis = store.get(board.fen(), STOCKFISH_LIMITS[analysis_mode])
+    if stored_analysis is not None:
+        return stored_analysis
+
+    (move_sequences, ranked_moves) = run_stockfish_evaluation(board, analysis_mode)
+    store.put(board.fen(), STOCKFISH_LIMITS[analysis_mode], move_sequences, ranked_moves)
+    return (move_sequences, ranked_moves)
+
+def run_stockfish_evaluation(board, analysis_mode=DEFAULT_ANALYSIS_MODE):
+    # Engines are kept running between positions instead of being started for every board
+    with get_engine_pool().engine() as engine:
+        if analysis_mode == "multipv":
+            move_infos = analyse_multipv(board, engine, MULTIPV_LIMIT)
+        else:
+            move_infos = analyse_root_moves(board, engine)
+    return rank_move_infos(move_infos)
+
+# The move sequences and ranks of an analysis, (None, None) if it failed
+def rank_move_infos(move_infos):
+    if move_infos is None:
+        return (None, None)
+    return rank_root_moves(move_infos)
+
+# The searches of the root_moves analysis, without the engine: yields the (move, limit) of every
+# search and is sent back its info. Returns the (move, info) of every root move or None if it failed
+def root_move_searches(board, progress=False):
+    legal_moves = list(board.legal_moves)
+    if progress:
+        # Use tqdm for the loop with additional information
+        legal_moves = tqdm(legal_moves, desc="Evaluating Moves", unit="move", total=len(legal_moves), position=1, unit_scale=True)
 
-    # Use tqdm for the loop with additional information
-    for move in tqdm(board.legal_moves, desc="Evaluating Moves", unit="move", total=total_moves, position=1, unit_scale=True):
+    move_infos = []
+    for move in legal_moves:
         # Find the next two moves and evaluate the score
         principle_moveset = []
-        score = None
         time_to_find_moveset = 1
-        
-        while len(principle_moveset) < two_ply_moves * 2:
-            info = engine.analyse(board, chess.engine.Limit(time=time_to_find_moveset, depth=20), root_moves=[move])
+
+        while len(principle_moveset) < PV_LENGTH:
+            info = yield (move, chess.engine.Limit(time=time_to_find_moveset, depth=20))
             principle_moveset = info['pv']
-            score = info['score']
             time_to_find_moveset += 0.1
 
             if time_to_find_moveset > 5:
                 print(f"Time to find moveset exceeded 5 seconds. Breaking.")
-                return (None, None)
+                return None
+
+        move_infos.append((move, info))
+
+    return move_infos
+
+# Evaluate the score of every legal move with one search per move
+def analyse_root_moves(board, engine):
+    searches = root_move_searches(board, progress=True)
+    info = None
+    try:
+        while True:
+            move, limit = searches.send(info)
+            info = engine.analyse(board, limit, root_moves=[move])
+    except StopIteration as result:
+        return result.value
 
+# Evaluate the score of every legal move with a single MultiPV search
+def analyse_multipv(board, engine, limit):
+    legal_moves = list(board.legal_moves)
+    infos = engine.analyse(board, limit, multipv=len(legal_moves))
+    return multipv_move_infos(legal_moves, infos)
+
+# Match the lines of a MultiPV search to the root moves they score
+def multipv_move_infos(legal_moves, infos):
+    # Every line starts with the root move it scores
+    root_infos = {}
+    for info in infos:
+        if info.get('pv') and 'score' in info:
+            root_infos.setdefault(info['pv'][0], info)
+
+    if len(root_infos) < len(legal_moves):
+        print(f"MultiPV search only scored {len(root_infos)} of {len(legal_moves)} moves. Breaking.")
+        return None
+
+    # Keep the legal move order so ties are ranked the same way in both modes
+    return [(move, root_infos[move]) for move in legal_moves]
+
+# Build the move sequences and ranks (and get the next best move) from the (move, info) of every root move
+def rank_root_moves(move_infos):
+    move_sequences = {}
+    best_moves_ascending = []
+
+    for move, info in move_infos:
         move_sequences[move.uci()] = {
             'score': info['score'],
             # Get the first depth number of moves in the principle variation
-            'next_moves': info['pv'][:two_ply_moves * 2]
+            'next_moves': info['pv'][:PV_LENGTH]
         }
 
         # Add the move to the ranked moves list
-        best_moves_ascending.append((move, score))
+        best_moves_ascending.append((move, info['score']))
 
     #print(f"Move Sequences: {move_sequences}")
-    engine.quit()
 
     # Sort the moves by score
     best_moves_ascending.sort(key=lambda x: x[1].relative.score(mate_score=2000), reverse=chess.WHITE)
@@ -61,9 +159,11 @@ def stockfish_evaluation(board):
     #print(f"Best Moves: {best_moves_ascending}")
     return (move_sequences, ranked_moves)
 
+PGN_PATH = './src/utility/master_games.pgn'
+
 def load_games():
     games = []
-    with open('./src/utility/master_games.pgn') as file:
+    with open(PGN_PATH) as file:
         while True:
             game = chess.pgn.read_game(file)
             if game is None:
@@ -72,9 +172,66 @@ def load_games():
     
     return games
 
-def extract_random_chess_positions(num_positions, seed=None):
-    # Load the games from the PGN file
-    games = load_games()
+def build_pgn_index(pgn_path=PGN_PATH):
+    # Byte offset of the start of every game in the PGN
+    offsets = []
+    with open(pgn_path) as file:
+        while True:
+            offset = file.tell()
+            if not chess.pgn.skip_game(file):
+                break
+            offsets.append(offset)
+
+    return offsets
+
+def load_pgn_index(pgn_path=PGN_PATH):
+    # The index is stored next to the PGN and rebuilt whenever the PGN changes
+    index_path = pgn_path + '.index.json'
+    pgn_stat = os.stat(pgn_path)
+
+    if os.path.exists(index_path):
+        with open(index_path) as index_file:
+            index = json.load(index_file)
+        if index['size'] == pgn_stat.st_size and index['mtime_ns'] == pgn_stat.st_mtime_ns:
+            return index['offsets']
+
+    offsets = build_pgn_index(pgn_path)
+    with open(index_path, 'w') as index_file:
+        json.dump({'size': pgn_stat.st_size, 'mtime_ns': pgn_stat.st_mtime_ns, 'offsets': offsets}, index_file)
+
+    return offsets
+
+def read_game_at(offset, pgn_path=PGN_PATH):
+    with open(pgn_path) as file:
+        file.seek(offset)
+        return chess.pgn.read_game(file)
+
+# Traverse a random game to a random position, the same seed always gives the same position
+def sample_random_position(game_offsets, seed):
+    random.seed(seed)
+
+    random_game = read_game_at(game_offsets[random.randrange(len(game_offsets))])
+    #print(f"Game: {random_game.headers['Event']}")
+
+    #print(f"PGN Used: {random_game}")
+
+    # Traverse the game to a random position
+    board = random_game.board()
+    board_moves = list(random_game.mainline_moves())
+
+    total_moves = 1
+    num_moves_to_traverse = random.randint(40, len(board_moves) - 40)
+    for _ in range(num_moves_to_traverse):
+        move = board_moves.pop(0)
+        board.push(move)
+        total_moves += 1
+
+    #print(f"Final Ply: {(total_moves//2)}\n")
+    return (board, board_moves)
+
+def extract_random_chess_positions(num_positions, seed=None, analysis_mode=DEFAULT_ANALYSIS_MODE):
+    # Only the index is loaded, games are parsed when they are sampled
+    game_offsets = load_pgn_index()
 
     board_data = []
     # Extract random positions
@@ -84,36 +241,19 @@ def extract_random_chess_positions(num_positions, seed=None):
             seed = random.randint(0, 1000000)
         
         print(f"Seed used: {seed}")
-        random.seed(seed)
-
-        random_game = random.choice(games)
-        #print(f"Game: {random_game.headers['Event']}")
-
-        #print(f"PGN Used: {random_game}")
-
-        # Traverse the game to a random position
-        board = random_game.board()
-        board_moves = list(random_game.mainline_moves())
-
-        total_moves = 1
-        num_moves_to_traverse = random.randint(40, len(board_moves) - 40)
-        for _ in range(num_moves_to_traverse):
-            move = board_moves.pop(0)
-            board.push(move)
-            total_moves += 1
+        (board, board_moves) = sample_random_position(game_offsets, seed)
 
-        #print(f"Final Ply: {(total_moves//2)}\n")
-        (move_sequences, ranked_moves) = stockfish_evaluation(board)
+        (move_sequences, ranked_moves) = stockfish_evaluation(board, analysis_mode)
 
         if move_sequences is None or ranked_moves is None:
-            return extract_random_chess_positions(num_positions, seed=seed+1)
+            return extract_random_chess_positions(num_positions, seed=seed+1, analysis_mode=analysis_mode)
 
         # Output information about the current position
         # print(f"Game: {random_game.headers['Event']}")
         # print(f"Position: {board.fen()}")
         # print(f"Turn: {'White' if board.turn == chess.WHITE else 'Black'}")
         # print(f"Next Move (IN EXTRACTION): {board_moves[0] if board_moves else 'Game Over'}\n")
-        board_data.append((board, board_moves, move_sequences, ranked_moves, {}))
+        board_data.append((board, board_moves, move_sequences, ranked_moves, shared_eval_count_cache))
 
 
     return board_data
@@ -0,0 +1,130 @@
+import os
+import queue
+import atexit
+import threading
+from contextlib import contextmanager
+
+import chess
+import chess.engine
+
+STOCKFISH_PATH = "./stockfish"
+DEFAULT_ENGINE_OPTIONS = {"Threads": 1, "Hash": 64}
+
+
+class EnginePool:
+    """Pool of long-lived UCI engine processes.
+
+    Engines are started lazily up to `size`, health checked before they're handed out
+    and restarted if they've crashed. `options` are the UCI options of every engine, or a
+    list with the options of each of the `size` engine slots.
+    """
+
+    def __init__(self, engine_path=STOCKFISH_PATH, size=1, options=None):
+        self.engine_path = engine_path
+        self.size = size
+        if options is None:
+            options = DEFAULT_ENGINE_OPTIONS
+        self.slot_options = list(options) if isinstance(options, list) else [options] * size
+        if len(self.slot_options) != size:
+            raise ValueError(f"Expected options for {size} engines, got {len(self.slot_options)}")
+
+        self.available = queue.Queue()
+        # Slot of every running engine, an engine is restarted with the options of its slot
+        self.slots = {}
+        self.free_slots = list(range(size))
+        self.lock = threading.Lock()
+        self.closed = False
+
+    def start_engine(self, slot: int) -> chess.engine.SimpleEngine:
+        try:
+            engine = chess.engine.SimpleEngine.popen_uci(self.engine_path)
+            # Only configure the options this engine understands
+            options = self.slot_options[slot]
+            engine.configure({name: value for name, value in options.items() if name in engine.options})
+        except Exception:
+            # The slot can be filled by another engine later
+            with self.lock:
+                self.free_slots.append(slot)
+            raise
+
+        with self.lock:
+            self.slots[engine] = slot
+        return engine
+
+    def is_healthy(self, engine: chess.engine.SimpleEngine) -> bool:
+        try:
+            engine.ping()
+            return True
+        except (chess.engine.EngineError, chess.engine.EngineTerminatedError, TimeoutError):
+            return False
+
+    def restart_engine(self, engine: chess.engine.SimpleEngine) -> chess.engine.SimpleEngine:
+        with self.lock:
+            slot = self.slots.pop(engine)
+        try:
+            engine.close()
+        except Exception:
+            pass
+        return self.start_engine(slot)
+
+    def acquire(self) -> chess.engine.SimpleEngine:
+        if self.closed:
+            raise RuntimeError("Engine pool is closed")
+
+        try:
+            engine = self.available.get_nowait()
+        except queue.Empty:
+            with self.lock:
+                slot = self.free_slots.pop(0) if self.free_slots else None
+            if slot is not None:
+                return self.start_engine(slot)
+            # Every engine is busy, wait for one to be released
+            engine = self.available.get()
+
+        if not self.is_healthy(engine):
+            engine = self.restart_engine(engine)
+        return engine
+
+    def release(self, engine: chess.engine.SimpleEngine):
+        if self.closed:
+            engine.quit()
+        else:
+            self.available.put(engine)
+
+    @contextmanager
+    def engine(self):
+        engine = self.acquire()
+        try:
+            yield engine
+        except chess.engine.EngineTerminatedError:
+            # The engine crashed while in use, put a fresh one back in its place. If it can't be
+            # restarted its slot is freed instead
+            crashed_engine, engine = engine, None
+            engine = self.restart_engine(crashed_engine)
+            raise
+        finally:
+            if engine is not None:
+                self.release(engine)
+
+    def close(self):
+        self.closed = True
+        while True:
+            try:
+                engine = self.available.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                engine.quit()
+            except (chess.engine.EngineError, chess.engine.EngineTerminatedError):
+                pass
+
+
+engine_pool = None
+
+def get_engine_pool() -> EnginePool:
+    # Shared pool with one engine per core, engines are only started when they're needed
+    global engine_pool
+    if engine_pool is None:
+        engine_pool = EnginePool(size=os.cpu_count() or 1)
+        atexit.register(engine_pool.close)
+    return engine_pool
@@ -1,52 +1,19 @@
-from itertools import product
-
-def check_conditions(combo):
-    # Count occurrences of "X" and "O"
-    count_x = combo.count("X")
-    count_o = combo.count("O")
-
-    # Check conditions for X and O
-    x_conditions = [
-        not (combo[0] == combo[1] == combo[2] == "X"),
-        not (combo[3] == combo[4] == combo[5] == "X"),
-        not (combo[6] == combo[7] == combo[8] == "X"),
-        not (combo[0] == combo[3] == combo[6] == "X"),
-        not (combo[1] == combo[4] == combo[7] == "X"),
-        not (combo[2] == combo[5] == combo[8] == "X"),
-        not (combo[0] == combo[4] == combo[8] == "X"),
-        not (combo[2] == combo[4] == combo[6] == "X"),
-    ]
-
-    o_conditions = [
-        not (combo[0] == combo[1] == combo[2] == "O"),
-        not (combo[3] == combo[4] == combo[5] == "O"),
-        not (combo[6] == combo[7] == combo[8] == "O"),
-        not (combo[0] == combo[3] == combo[6] == "O"),
-        not (combo[1] == combo[4] == combo[7] == "O"),
-        not (combo[2] == combo[5] == combo[8] == "O"),
-        not (combo[0] == combo[4] == combo[8] == "O"),
-        not (combo[2] == combo[4] == combo[6] == "O"),
-    ]
-
-    # Number of X and O equal, so that X is next move
-    return all(x_conditions) and all(o_conditions) and count_o == 3 and count_x == 2
-
-# Define the possible values for each space
-options = [" ", "X", "O"]
-
-# Generate all combinations
-combinations = list(product(options, repeat=9))
-
-# Filter combinations based on conditions
-filtered_combinations = [combo for combo in combinations if check_conditions(combo)]
-
-# Print debug information
-print(f"Total combinations: {len(combinations)}")
-print(f"Filtered combinations: {len(filtered_combinations)}")
-
-# Write filtered combinations to a text file with comma as delimiter
-with open("./src/utility/ttt_all_incomplete_board_states.csv", "w") as file:
-    for combo in filtered_combinations:
-        file.write(",".join(combo) + "\n")
-
-print("Filtered combinations have been written to ./src/utility/ttt_all_incomplete_board_states.csv")
\ No newline at end of file
+# Run from the repository root: python -m src.utility.generate_possible_ttt
+from src.utility.ttt_states import NUM_CODES, SYMBOLS, code_cells, enumerate_states
+
+if __name__ == "__main__":
+    # Stream the incomplete states instead of materializing every combination
+    num_states = 0
+    num_canonical = 0
+    with open("./src/utility/ttt_all_incomplete_board_states.csv", "w") as file:
+        for code, canonical_id in enumerate_states():
+            file.write(",".join(SYMBOLS[cell] for cell in code_cells(code)) + "\n")
+            num_states += 1
+            num_canonical = max(num_canonical, canonical_id + 1)
+
+    # Print debug information
+    print(f"Total combinations: {NUM_CODES}")
+    print(f"Filtered combinations: {num_states}")
+    print(f"Up to rotations and reflections: {num_canonical}")
+
+    print("Filtered combinations have been written to ./src/utility/ttt_all_incomplete_board_states.csv")
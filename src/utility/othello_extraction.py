@@ -1,21 +1,22 @@
+import os
 import csv
 import random
+import hashlib
 
-from src.game.othello.othello_game import OthelloGame
+import numpy as np
+
+from src.game.othello.othello_game import OthelloGame, canonical_board
 
 data_file = "./src/utility/othello_world_championship_2022.csv"
+cache_dir = "./cache"
 train_data = []
 test_data = []
 
 
-def initialize_train_test_data(train_ratio=0.6, seed=0, randomize=True) -> None:
+def read_games() -> list[str]:
     """
-    Initializes the train and test data for Othello.
-
-    :param train_ratio: Ratio of training positions to test positions.
-    :param randomize: If True, the positions are shuffled.
+    Reads the move string of every game in the dataset.
     """
-    random.seed(seed)
     with open(data_file) as csvfile:
         reader = csv.reader(csvfile, delimiter=",")
         raw_data = []  # Each row in the CSV file
@@ -23,22 +24,80 @@ def initialize_train_test_data(train_ratio=0.6, seed=0, randomize=True) -> None:
             raw_data.append(row)
     raw_data = raw_data[1:]  # Remove header row
 
-    board_data: dict[str, str] = {}
+    games = []
     for row in raw_data:
         _, _, _, move = row
-        for i in range(len(move) // 2 - 1):
-            board_tmp = OthelloGame(move[: 2 * i + 2])
-            board_str = str(board_tmp)
-            if board_str not in board_data:
-                board_data[board_str] = move[: 2 * i + 2]
-
-    board_moves = list(board_data.values())
-    if randomize:
-        random.shuffle(board_moves)
-
-    split = int(len(board_data) * train_ratio)
-    train_data.extend(board_moves[:split])
-    test_data.extend(board_moves[split:])
+        games.append(move)
+    return games
+
+
+def unique_positions(games: list[str]) -> list[tuple[int, int]]:
+    """
+    Replays every game once and returns the (game index, number of moves) of the first prefix
+    that reaches each distinct position. With symmetric weights, positions that are rotations or
+    reflections of each other are the same position.
+    """
+    seen_boards = set()
+    positions = []
+    for game_idx, game in enumerate(games):
+        num_prefixes = len(game) // 2 - 1
+        for num_moves, (board, _) in enumerate(OthelloGame.replay(game[: 2 * num_prefixes]), start=1):
+            if OthelloGame.SYMMETRIC:
+                board = canonical_board(board)
+            if board not in seen_boards:
+                seen_boards.add(board)
+                positions.append((game_idx, num_moves))
+    return positions
+
+
+def positions_cache_path(seed, train_ratio: float, randomize: bool) -> str:
+    with open(data_file, "rb") as source:
+        source_hash = hashlib.sha256(source.read()).hexdigest()[:16]
+    symmetric = "_symmetric" if OthelloGame.SYMMETRIC else ""
+    return os.path.join(cache_dir, f"othello_positions_{source_hash}_{seed}_{train_ratio}_{int(randomize)}{symmetric}.npz")
+
+
+def initialize_train_test_data(train_ratio=0.6, seed=0, randomize=True) -> None:
+    """
+    Initializes the train and test data for Othello.
+    The split is stored in the cache directory and reused as long as the dataset, seed and ratio are the same.
+
+    :param train_ratio: Ratio of training positions to test positions.
+    :param randomize: If True, the positions are shuffled.
+    """
+    random.seed(seed)
+    # Without a seed the shuffle isn't reproducible, so the split can't be reused
+    cache_path = positions_cache_path(seed, train_ratio, randomize) if seed is not None else None
+
+    if cache_path is not None and os.path.exists(cache_path):
+        with np.load(cache_path) as cached:
+            games = cached["games"].tolist()
+            train_positions = cached["train"].tolist()
+            test_positions = cached["test"].tolist()
+        if randomize:
+            # Leave the random module in the same state as shuffling the positions would
+            random.shuffle(list(range(len(train_positions) + len(test_positions))))
+    else:
+        games = read_games()
+        positions = unique_positions(games)
+        if randomize:
+            random.shuffle(positions)
+
+        split = int(len(positions) * train_ratio)
+        train_positions = positions[:split]
+        test_positions = positions[split:]
+
+        if cache_path is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            np.savez_compressed(
+                cache_path,
+                games=np.array(games),
+                train=np.array(train_positions, dtype=np.int32).reshape((-1, 2)),
+                test=np.array(test_positions, dtype=np.int32).reshape((-1, 2)),
+            )
+
+    train_data.extend(games[game_idx][: 2 * num_moves] for game_idx, num_moves in train_positions)
+    test_data.extend(games[game_idx][: 2 * num_moves] for game_idx, num_moves in test_positions)
     return
 
 
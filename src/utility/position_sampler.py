@@ -0,0 +1,103 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from src.game.othello.othello_game import OthelloGame
+from src.game.position_batch import PositionBatch
+from src.utility.chess_extraction import extract_random_chess_positions
+from src.utility.game_chooser import create_base_game
+from src.utility.othello_extraction import extract_random_othello_positions
+from src.utility.ttt_extraction import extract_random_ttt_positions
+from src.utility.ttt_states import split_rows
+
+
+def init_worker(othello_settings: dict) -> None:
+    # Workers that don't fork start with the default settings, which decide how the Othello dataset is deduplicated
+    for name, value in othello_settings.items():
+        setattr(OthelloGame, name, value)
+
+
+def extract_position(game_name, seed):
+    """Training position number `seed` of a game."""
+    if game_name == "chess":
+        board, board_moves, move_sequences, ranked_moves, _ = extract_random_chess_positions(num_positions=1, seed=seed)[0]
+        # The game falls back on the eval cache of the process it is created in
+        return (board, board_moves, move_sequences, ranked_moves, None)
+    elif game_name == "othello":
+        # Same train/test split as the evaluation positions, which are drawn without shuffling
+        return extract_random_othello_positions(seed=seed, num_positions=1, randomize=False)[0]
+    elif game_name == "tictactoe":
+        # Board number 0 draws a random board, so the seeds cycle through the others
+        num_boards = len(split_rows(True))
+        return extract_random_ttt_positions(num_positions=1, board_number=1 + (seed - 1) % (num_boards - 1))[0]
+    else:
+        raise ValueError("Invalid game name. Supported options: chess, othello, go")
+
+
+def extract_batch(game_name, seeds):
+    # Chess positions are labelled one after the other through the engine pool of the process,
+    # so the background process only runs a single engine while the optimizer trains
+    return [extract_position(game_name, seed) for seed in seeds]
+
+
+class PositionSampler:
+    """Streams mini-batches of training positions of a game.
+
+    Position i of the stream is the training position extracted with seed `seed + i`, so a stream is
+    the same from run to run. The next `prefetch` batches are extracted in a background process while
+    the current one is being trained on, which also keeps the extraction from reseeding the random
+    state of the optimizer.
+    """
+
+    def __init__(self, game_name, seed=1, batch_size=16, prefetch=2):
+        self.game_name = game_name
+        self.next_seed = seed
+        self.batch_size = batch_size
+        self.prefetch = prefetch
+
+        self.executor = None
+        self.pending = deque()
+
+    def start(self):
+        if self.executor is None:
+            othello_settings = {name: value for name, value in vars(OthelloGame).items() if name.isupper()}
+            self.executor = ProcessPoolExecutor(1, initializer=init_worker, initargs=(othello_settings,))
+            self.fill()
+
+    def close(self):
+        if self.executor is not None:
+            for future in self.pending:
+                future.cancel()
+            self.pending.clear()
+            self.executor.shutdown()
+            self.executor = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def fill(self):
+        while len(self.pending) < self.prefetch + 1:
+            seeds = list(range(self.next_seed, self.next_seed + self.batch_size))
+            self.next_seed += self.batch_size
+            self.pending.append(self.executor.submit(extract_batch, self.game_name, seeds))
+
+    def next_batch(self) -> list:
+        """Board data of the next `batch_size` positions of the stream."""
+        self.start()
+        board_data = self.pending.popleft().result()
+        self.fill()
+        return board_data
+
+    def next_game(self) -> PositionBatch:
+        """The next mini-batch as a single game."""
+        return PositionBatch([create_base_game(self.game_name, board_data) for board_data in self.next_batch()])
+
+    def initial_games(self, num_individuals) -> list:
+        """Games to start a population from: the next mini-batch followed by games that only provide
+        random starting weights for the other individuals."""
+        batch = self.next_game()
+        board_data = batch.games[0].get_board_data()
+        return [batch] + [create_base_game(self.game_name, board_data) for _ in range(num_individuals - 1)]
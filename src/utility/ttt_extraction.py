@@ -1,51 +1,77 @@
-import math
+import os
 import time
 import random
-
-def minimax(board, player, max_player, original_board):
-    maxplayer = "X"
+from functools import lru_cache
+
+import numpy as np
+
+from src.game.tictactoe.bitboard import (
+    CELL_MASKS, FULL_MASK, NUM_CELLS, IS_WIN, CELL_COUNT, BASE_4_VALUE, board_masks, mask_cells, mask_winner
+)
+from src.utility.ttt_states import load_states, state_board, split_rows
+
+cache_dir = "./cache"
+minimax_table_path = os.path.join(cache_dir, "ttt_minimax_table.npy")
+
+# Every cell is empty, X, O or neutral. Neutral cells hold any other symbol (e.g. the "O " left in the
+# last cell when a csv line is split without stripping) and are neither playable nor part of a line
+EMPTY = 0
+X_CELL = 1
+O_CELL = 2
+NEUTRAL = 3
+NUM_STATES = 4 ** NUM_CELLS
+CELL_VALUES = [4 ** cell for cell in range(NUM_CELLS)]
+# Rows of the minimax table, by the player to move
+X_TO_MOVE = 0
+O_TO_MOVE = 1
+minimax_table = None
+
+
+@lru_cache(maxsize=None)
+def minimax_score(x_mask, o_mask, empty_mask, player, max_player):
     other_player = 'O' if player == 'X' else 'X'
-
-    winner = check_winner(board)
-    empties = available_moves(board)
+    winner = mask_winner(x_mask, o_mask)
 
     # Base cases
     if winner == other_player:
-        return {'position': None, 'score': 1 * (len(empties) + 1) if other_player == max_player else -1 * (
-                    len(empties) + 1)}
-    elif not empties:
-        return {'position': None, 'score': 0}
-
-    if player == max_player:
-        best = {'position': None, 'score': -math.inf}  # each score should maximize
-    else:
-        best = {'position': None, 'score': math.inf}  # each score should minimize
-
-    # List to store [(move, cumulative_score)] for each move
-    moves_and_scores = []
+        num_empties = CELL_COUNT[empty_mask]
+        return num_empties + 1 if other_player == max_player else -(num_empties + 1)
+    elif not empty_mask:
+        return 0
+
+    scores = []
+    for move in mask_cells(empty_mask):
+        move_mask = CELL_MASKS[move]
+        if player == "X":
+            scores.append(minimax_score(x_mask | move_mask, o_mask, empty_mask ^ move_mask, other_player, max_player))
+        else:
+            scores.append(minimax_score(x_mask, o_mask | move_mask, empty_mask ^ move_mask, other_player, max_player))
+    # each score should maximize for the max player and minimize for the other
+    return max(scores) if player == max_player else min(scores)
 
-    for possible_move in available_moves(board):
-        original_board_copy = list(original_board)
-        make_move(board, possible_move, player)
 
-        sim_score = minimax(board, other_player, max_player, original_board_copy)
+def minimax(board, player, max_player):
+    """
+    Returns the [(move, score)] of every move of `player`, or a {'position', 'score'} dict if the game is already over.
+    """
+    x_mask, o_mask, empty_mask = board_masks(board)
+    other_player = 'O' if player == 'X' else 'X'
 
-        undo_move(board, possible_move)
-        moves_and_scores.append((possible_move, sim_score['score']))
-        #print("sim_score: {}".format(sim_score))
-        #print(moves_and_scores)
+    if mask_winner(x_mask, o_mask) == other_player:
+        num_empties = CELL_COUNT[empty_mask]
+        return {'position': None, 'score': num_empties + 1 if other_player == max_player else -(num_empties + 1)}
+    elif not empty_mask:
+        return {'position': None, 'score': 0}
 
-        if player == max_player:  # X is max player
-            if sim_score['score'] > best['score']:
-                best = sim_score
+    moves_and_scores = []
+    for move in mask_cells(empty_mask):
+        move_mask = CELL_MASKS[move]
+        if player == "X":
+            score = minimax_score(x_mask | move_mask, o_mask, empty_mask ^ move_mask, other_player, max_player)
         else:
-            if sim_score['score'] < best['score']:
-                best = sim_score
-
-    if board == original_board:  # Only return moves_and_scores for the initial function call
-        return moves_and_scores
-    else:
-        return best
+            score = minimax_score(x_mask, o_mask | move_mask, empty_mask ^ move_mask, other_player, max_player)
+        moves_and_scores.append((move, score))
+    return moves_and_scores
 
 
 def available_moves(board):
@@ -59,60 +85,97 @@ def make_move(board, possible_move, player):
 
 
 def check_winner(board):
-    # Check conditions for X and O
-    x_conditions = [
-        (board[0] == board[1] == board[2] == "X"),
-        (board[3] == board[4] == board[5] == "X"),
-        (board[6] == board[7] == board[8] == "X"),
-        (board[0] == board[3] == board[6] == "X"),
-        (board[1] == board[4] == board[7] == "X"),
-        (board[2] == board[5] == board[8] == "X"),
-        (board[0] == board[4] == board[8] == "X"),
-        (board[2] == board[4] == board[6] == "X"),
-    ]
-
-    o_conditions = [
-        (board[0] == board[1] == board[2] == "O"),
-        (board[3] == board[4] == board[5] == "O"),
-        (board[6] == board[7] == board[8] == "O"),
-        (board[0] == board[3] == board[6] == "O"),
-        (board[1] == board[4] == board[7] == "O"),
-        (board[2] == board[5] == board[8] == "O"),
-        (board[0] == board[4] == board[8] == "O"),
-        (board[2] == board[4] == board[6] == "O"),
-    ]
-
-    if any(x_conditions):
-        return "X"
-    elif any(o_conditions):
-        return "O"
-    else:
-        return None
-
-def extract_random_ttt_positions(num_positions, train=True, board_number=None):
-    # Load the games from the PGN file
-    games = []
-    with open("src/utility/ttt_all_incomplete_board_states.csv", "r") as file:
-        all_games = file.readlines()
-
-    if train:
-        # first half of games in csv
-        games = all_games[:int(len(all_games) * 0.5)]
-    else:
-        # second half of games in csv
-        games = all_games[int(len(all_games) * 0.5):]
+    x_mask, o_mask, _ = board_masks(board)
+    return mask_winner(x_mask, o_mask)
+
+
+def state_index(x_mask, o_mask, empty_mask):
+    neutral_mask = FULL_MASK & ~(x_mask | o_mask | empty_mask)
+    return X_CELL * BASE_4_VALUE[x_mask] + O_CELL * BASE_4_VALUE[o_mask] + NEUTRAL * BASE_4_VALUE[neutral_mask]
+
+
+def build_minimax_table():
+    """
+    Solves every 3x3 state with X as the max player, for both players to move, with the same scoring as `minimax`.
+    States are solved in order of their number of empty cells, so every child is solved before its parent.
+    """
+    states = np.arange(NUM_STATES)
+    cells = np.stack([(states // value) % 4 for value in CELL_VALUES])
+    num_empties = np.sum(cells == EMPTY, axis=0)
+    is_win = np.array(IS_WIN)
+    x_wins = is_win[np.sum([(cells[cell] == X_CELL) << cell for cell in range(NUM_CELLS)], axis=0)]
+    # X is reported as the winner when both players have a line
+    o_wins = ~x_wins & is_win[np.sum([(cells[cell] == O_CELL) << cell for cell in range(NUM_CELLS)], axis=0)]
+
+    table = np.zeros((2, NUM_STATES), dtype=np.int8)
+    for empties in range(NUM_CELLS + 1):
+        level = states[num_empties == empties]
+        for to_move, code, other_wins, sign in ((X_TO_MOVE, X_CELL, o_wins, -1), (O_TO_MOVE, O_CELL, x_wins, 1)):
+            if empties == 0:
+                scores = np.zeros(len(level), dtype=np.int16)
+            else:
+                # X maximizes and O minimizes over the children, occupied cells never win the comparison
+                child_scores = np.full((NUM_CELLS, len(level)), sign * 100, dtype=np.int16)
+                for cell, value in enumerate(CELL_VALUES):
+                    playable = cells[cell, level] == EMPTY
+                    child_scores[cell, playable] = table[1 - to_move, level[playable] + code * value]
+                scores = child_scores.max(axis=0) if to_move == X_TO_MOVE else child_scores.min(axis=0)
+            # The player that just moved has won
+            won = other_wins[level]
+            scores[won] = sign * (empties + 1)
+            table[to_move, level] = scores
+    return table
+
+
+def load_minimax_table():
+    """
+    Loads the solved table from the cache directory, solving and storing it the first time.
+    """
+    global minimax_table
+    if minimax_table is None:
+        if os.path.exists(minimax_table_path):
+            minimax_table = np.load(minimax_table_path)
+        else:
+            minimax_table = build_minimax_table()
+            os.makedirs(cache_dir, exist_ok=True)
+            np.save(minimax_table_path, minimax_table)
+    return minimax_table
+
+
+def solved_moves_and_scores(board):
+    """
+    Same result as `minimax(board, "X", "X")`, looked up in the solved table instead of searched.
+    """
+    table = load_minimax_table()
+    x_mask, o_mask, empty_mask = board_masks(board)
+    state = state_index(x_mask, o_mask, empty_mask)
+
+    if mask_winner(x_mask, o_mask) == "O":
+        return {'position': None, 'score': -(CELL_COUNT[empty_mask] + 1)}
+    elif not empty_mask:
+        return {'position': None, 'score': 0}
+    return [(move, int(table[O_TO_MOVE, state + X_CELL * CELL_VALUES[move]])) for move in mask_cells(empty_mask)]
+
+
+def read_ttt_boards():
+    return [state_board(row) for row in range(len(load_states()))]
+
+
+def extract_random_ttt_positions(num_positions, train=True, board_number=None, symmetric=False):
+    # first half of the states for training, second half for testing
+    rows = split_rows(train, symmetric=symmetric)
 
     board_data = []
     # Extract random positions
     for _ in range(num_positions):
-        # Choose a random game, currently represented as a line in a csv file
+        # Choose a random state
         if board_number: 
-            board = games[board_number].replace('\n', ' ').split(",")
+            board = state_board(rows[board_number], raw=True)
         else:
-            board = [item.replace('\n', ' ').strip() if item.strip() != '' else ' ' for item in  random.choice(games).split(",")]
+            board = state_board(random.choice(rows))
         print(board)
         #board = ['O', ' ', ' ', ' ', ' ', 'O', ' ', ' ', 'X']
-        moves_and_scores = minimax(board, player="X", max_player="X", original_board=board)
+        moves_and_scores = solved_moves_and_scores(board)
         board_data.append((board, moves_and_scores))
 
     return board_data
@@ -0,0 +1,129 @@
+import os
+
+import numpy as np
+
+from src.game.tictactoe.bitboard import NUM_CELLS, CELL_MASKS, IS_WIN, CELL_COUNT
+
+cache_dir = "./cache"
+states_path = os.path.join(cache_dir, "ttt_states.npy")
+
+# Cells are numbered like the csv columns, a state is the base 3 number of its cells with cell 0 as
+# the most significant digit, so increasing codes are in the same order as itertools.product
+SYMBOLS = [" ", "X", "O"]
+NUM_CODES = 3 ** NUM_CELLS
+DIGIT_VALUES = [3 ** (NUM_CELLS - 1 - cell) for cell in range(NUM_CELLS)]
+
+# Cell each cell is moved to by the 4 rotations and 4 reflections of the board
+SYMMETRIES = [
+    [new_row * 3 + new_col for new_row, new_col in (transform(cell // 3, cell % 3) for cell in range(NUM_CELLS))]
+    for transform in (
+        lambda row, col: (row, col),
+        lambda row, col: (col, 2 - row),
+        lambda row, col: (2 - row, 2 - col),
+        lambda row, col: (2 - col, row),
+        lambda row, col: (row, 2 - col),
+        lambda row, col: (2 - row, col),
+        lambda row, col: (col, row),
+        lambda row, col: (2 - col, 2 - row),
+    )
+]
+
+# Columns of the states file
+CODE = 0
+CANONICAL_ID = 1
+
+states = None
+state_rows = None
+
+
+def code_cells(code):
+    return [(code // value) % 3 for value in DIGIT_VALUES]
+
+
+def cells_code(cells):
+    return sum(cell * value for cell, value in zip(cells, DIGIT_VALUES))
+
+
+def canonical_code(cells):
+    """Smallest code of the rotations and reflections of the board."""
+    codes = []
+    for symmetry in SYMMETRIES:
+        transformed = [0] * NUM_CELLS
+        for cell, target in enumerate(symmetry):
+            transformed[target] = cells[cell]
+        codes.append(cells_code(transformed))
+    return min(codes)
+
+
+def is_incomplete_state(cells):
+    """
+    X is to move (two X and three O on the board) and neither player has a line.
+    """
+    x_mask = sum(CELL_MASKS[cell] for cell, symbol in enumerate(cells) if symbol == 1)
+    o_mask = sum(CELL_MASKS[cell] for cell, symbol in enumerate(cells) if symbol == 2)
+    return CELL_COUNT[x_mask] == 2 and CELL_COUNT[o_mask] == 3 and not IS_WIN[x_mask] and not IS_WIN[o_mask]
+
+
+def enumerate_states():
+    """
+    Yields the (code, canonical id) of every incomplete state in increasing order of code, without
+    materializing all 3^9 boards. Boards that are rotations or reflections of each other share the
+    canonical id, ids are dense and numbered in order of first appearance.
+    """
+    canonical_ids = {}
+    for code in range(NUM_CODES):
+        cells = code_cells(code)
+        if is_incomplete_state(cells):
+            canonical_id = canonical_ids.setdefault(canonical_code(cells), len(canonical_ids))
+            yield code, canonical_id
+
+
+def load_states():
+    """
+    Memory-maps the (number of states, 2) array of codes and canonical ids from the cache directory,
+    writing it the first time.
+    """
+    global states, state_rows
+    if states is None:
+        if not os.path.exists(states_path):
+            os.makedirs(cache_dir, exist_ok=True)
+            np.save(states_path, np.array(list(enumerate_states()), dtype=np.int32).reshape((-1, 2)))
+        states = np.load(states_path, mmap_mode="r")
+        # Perfect hash from the code of a state to its row, -1 for codes that aren't states
+        state_rows = np.full(NUM_CODES, -1, dtype=np.int32)
+        state_rows[states[:, CODE]] = np.arange(len(states), dtype=np.int32)
+    return states
+
+
+def state_board(row, raw=False):
+    """
+    List board of the state in a row. `raw` leaves a space in the last cell, like the newline of a csv
+    line split without being stripped, which makes that cell neither empty nor a player's.
+    """
+    board = [SYMBOLS[cell] for cell in code_cells(int(load_states()[row, CODE]))]
+    if raw:
+        board[-1] += " "
+    return board
+
+
+def board_row(board):
+    """Row of a list board in the states array, or -1 if it isn't one of the states."""
+    load_states()
+    board = [spot or " " for spot in board]
+    if any(spot not in SYMBOLS for spot in board):
+        return -1
+    return int(state_rows[cells_code([SYMBOLS.index(spot) for spot in board])])
+
+
+def split_rows(train, symmetric=False):
+    """
+    Rows of the first (train) or second (test) half of the states. With `symmetric` only the first
+    state of each canonical id is kept, so no board in one half is a rotation or reflection of a
+    board in the other.
+    """
+    rows = np.arange(len(load_states()))
+    if symmetric:
+        _, first_rows = np.unique(states[:, CANONICAL_ID], return_index=True)
+        rows = np.sort(first_rows)
+    split = int(len(rows) * 0.5)
+    return rows[:split] if train else rows[split:]
@@ -0,0 +1,8 @@
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The modules are imported as src.* and read their data and caches relative to the repository root
+sys.path.insert(0, REPO_ROOT)
+os.chdir(REPO_ROOT)
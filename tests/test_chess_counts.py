@@ -0,0 +1,54 @@
+import random
+
+import chess
+import pytest
+
+from src.game.chess.chess_game import ChessGame
+from src.game.chess.evaluations.bitboard import BitboardEvaluator, IncrementalBitboardEvaluator
+
+
+def random_boards(seed, num_games=6, max_plies=80):
+    """Boards reached by random games, with their move stacks so castling is counted."""
+    rng = random.Random(seed)
+    boards = []
+    for _ in range(num_games):
+        board = chess.Board()
+        for _ in range(rng.randrange(max_plies)):
+            moves = list(board.legal_moves)
+            if not moves:
+                break
+            board.push(rng.choice(moves))
+        boards.append(board)
+    return boards
+
+
+def flat_counts(scores_for_weights):
+    return [list(map(float, counts)) for evaluator_counts in scores_for_weights for counts in evaluator_counts]
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_bitboard_counts_match_square_evaluators(seed):
+    for board in random_boards(seed):
+        # square_eval_counts doesn't use the game, only the board
+        square_counts = flat_counts(ChessGame.square_eval_counts(None, board))
+        bitboard_counts = flat_counts(BitboardEvaluator(board).get_scores_for_weights())
+        assert bitboard_counts == square_counts, board.fen()
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_incremental_counts_match_full_counts(seed):
+    rng = random.Random(seed)
+    for root in random_boards(seed, num_games=3):
+        incremental_evaluator = IncrementalBitboardEvaluator(root)
+        # Principal variations of a few plies from every legal root move, like compute_move_features
+        for move in list(root.legal_moves):
+            board = root.copy()
+            board.push(move)
+            for _ in range(rng.randrange(4)):
+                moves = list(board.legal_moves)
+                if not moves:
+                    break
+                board.push(rng.choice(moves))
+
+            expected = flat_counts(BitboardEvaluator(board).get_scores_for_weights())
+            assert flat_counts([incremental_evaluator.get_scores_for_weights(board)]) == expected, board.fen()
@@ -0,0 +1,80 @@
+import numpy as np
+
+from src.game.tictactoe.ttt_game import tttGame, weight_bounds
+from src.optimization.fitness_memo import FitnessMemo
+from src.utility.ttt_extraction import solved_moves_and_scores
+
+BOARD = ["X", "O", " ", " ", "O", " ", "X", " ", "O"]
+
+
+def make_game(board=BOARD):
+    return tttGame((board, solved_moves_and_scores(board)))
+
+
+def random_weights(num_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(-10, 10, size=(num_rows, len(weight_bounds)))
+
+
+def assert_same_results(memo_results, results):
+    for memo_column, column in zip(memo_results, results):
+        assert np.array_equal(memo_column, column)
+
+
+def test_batch_rows_are_evaluated_once():
+    game = make_game()
+    memo = FitnessMemo()
+    weights = random_weights(4)
+    # Rows 0 and 2 hold the same weights
+    weights[2] = weights[0]
+
+    evaluated_rows = []
+
+    def evaluate(rows):
+        evaluated_rows.append(len(rows))
+        return game.fitness_batch(rows)
+
+    assert_same_results(memo.fitness_batch(game, weights, evaluate), game.fitness_batch(weights))
+    assert evaluated_rows == [3]
+    assert memo.counters() == (0, 4)
+
+    # Scoring the batch again is only hits, a new row is the only one evaluated
+    assert_same_results(memo.fitness_batch(game, weights, evaluate), game.fitness_batch(weights))
+    more_weights = np.vstack([weights, random_weights(1, seed=1)])
+    assert_same_results(memo.fitness_batch(game, more_weights, evaluate), game.fitness_batch(more_weights))
+    assert evaluated_rows == [3, 1]
+    assert memo.counters() == (8, 5)
+
+
+def test_positions_and_kinds_are_kept_apart():
+    game = make_game()
+    other_game = make_game(["X", " ", "O", " ", "O", " ", "X", "O", " "])
+    memo = FitnessMemo()
+    weights = random_weights(1)
+
+    memo.fitness_batch(game, weights)
+    memo.fitness_batch(other_game, weights)
+    assert memo.counters() == (0, 2)
+
+    # A single fitness isn't read from the rows of a batch
+    game.update_weights(list(weights[0]))
+    assert memo.fitness(game) == game.fitness()
+    assert memo.fitness(game) == game.fitness()
+    assert memo.counters() == (1, 3)
+
+
+def test_hit_rate_since_counters_and_eviction():
+    game = make_game()
+    memo = FitnessMemo(max_entries=3)
+    memo.fitness_batch(game, random_weights(2))
+
+    since = memo.counters()
+    weights = random_weights(3, seed=2)
+    memo.fitness_batch(game, weights)
+    memo.fitness_batch(game, weights)
+    assert memo.hit_rate(since) == 0.5
+    assert memo.report(since) == "Fitness memo hit rate: 50.0% (3 hits, 3 misses, 3 entries)"
+
+    # The two rows scored first were evicted
+    memo.fitness_batch(game, random_weights(2))
+    assert memo.counters() == (3, 7)
@@ -0,0 +1,91 @@
+import random
+
+import numpy as np
+import pytest
+
+from src.game.othello.othello_game import OthelloGame
+
+BLACK, WHITE, EMPTY = OthelloGame.BLACK, OthelloGame.WHITE, OthelloGame.EMPTY
+DIRECTIONS = [(-1, +0), (+1, +0), (+0, -1), (+0, +1), (-1, -1), (-1, +1), (+1, -1), (+1, +1)]
+
+
+# Reference implementation on 8x8 arrays, as the game was written before the bitboards
+def is_valid_move(board, player, move, direction):
+    row, col = move
+    r, c = row + direction[0], col + direction[1]
+    if not (0 <= r < 8 and 0 <= c < 8) or board[r, c] != -player:
+        return False
+    while 0 <= r < 8 and 0 <= c < 8 and board[r, c] == -player:
+        r, c = r + direction[0], c + direction[1]
+    return 0 <= r < 8 and 0 <= c < 8 and board[r, c] == player
+
+
+def list_valid_moves(board, player):
+    return [
+        (row, col)
+        for row in range(8)
+        for col in range(8)
+        if board[row, col] == EMPTY and any(is_valid_move(board, player, (row, col), direction) for direction in DIRECTIONS)
+    ]
+
+
+def list_make_move(board, player, move):
+    board_copy = board.copy()
+    board_copy[move] = player
+    for direction in DIRECTIONS:
+        if is_valid_move(board_copy, player, move, direction):
+            r, c = move[0] + direction[0], move[1] + direction[1]
+            while board_copy[r, c] == -player:
+                board_copy[r, c] = player
+                r, c = r + direction[0], c + direction[1]
+    return board_copy
+
+
+def random_game(seed):
+    """Game string of random moves, stopping when the player to move has to pass."""
+    rng = random.Random(seed)
+    game = OthelloGame("")
+    board, player = game.board, game.player
+    moves = ""
+    while True:
+        valid_moves = game.get_valid_moves(board, player)
+        if not valid_moves:
+            return moves
+        row, col = rng.choice(valid_moves)
+        moves += "ABCDEFGH"[col] + str(row + 1)
+        board, player = OthelloGame.make_move(board, player, (row, col)), -player
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_bitboard_moves_match_list_board(seed):
+    game = OthelloGame("")
+    positions = [(game.board, BLACK)] + list(OthelloGame.replay(random_game(seed)))
+    for board, player in positions:
+        list_board = game.to_array(board)
+        valid_moves = list_valid_moves(list_board, player)
+        assert game.get_valid_moves(board, player) == valid_moves
+
+        # Every move gives the same board in both representations
+        for move in valid_moves:
+            expected = list_make_move(list_board, player, move)
+            assert np.array_equal(game.to_array(OthelloGame.make_move(board, player, move)), expected)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_batched_fitness_matches_single_weights(seed):
+    np.random.seed(seed)
+    moves = random_game(seed)
+    game = OthelloGame(moves[: 2 * (len(moves) // 4)])
+    weights = np.random.uniform(OthelloGame.WEIGHTS_MIN, OthelloGame.WEIGHTS_MAX, size=(5, 64))
+
+    fitness_scores, best_move_indices, best_scores = game.fitness_batch(weights)
+    for row, row_weights in enumerate(weights):
+        game.update_weights(row_weights)
+        # Score of every move from the list board after the move
+        move_scores = [
+            game.evaluate_board(list_make_move(game.to_array(game.board), game.player, move), game.player)
+            for move in game.valid_moves
+        ]
+        assert best_move_indices[row] == int(np.argmax(move_scores))
+        assert best_scores[row] == pytest.approx(max(move_scores))
+        assert fitness_scores[row] == pytest.approx(np.mean(np.abs(np.array(move_scores) - game.ref_scores)))
@@ -0,0 +1,69 @@
+import random
+
+import pytest
+
+from src.game.othello.endgame import EndgameSolver, EndgameStore
+from src.game.othello.othello_game import OthelloGame, flips_for_move, valid_moves_mask
+
+
+def brute_force(own, opponent):
+    """Final disc difference for the player to move, searching every line without pruning."""
+    moves = valid_moves_mask(own, opponent)
+    if not moves:
+        if not valid_moves_mask(opponent, own):
+            return bin(own).count("1") - bin(opponent).count("1")
+        return -brute_force(opponent, own)
+
+    best_score = None
+    for cell in range(64):
+        move_mask = 1 << cell
+        if moves & move_mask:
+            flips = flips_for_move(own, opponent, move_mask)
+            score = -brute_force(opponent & ~flips, own | move_mask | flips)
+            best_score = score if best_score is None else max(best_score, score)
+    return best_score
+
+
+def endgame_position(seed, num_empties):
+    """(own, opponent) masks of the player to move once a random game has `num_empties` empty cells left."""
+    rng = random.Random(seed)
+    game = OthelloGame("")
+    board, player = game.board, game.player
+    while 64 - bin(board[0] | board[1]).count("1") > num_empties:
+        valid_moves = game.get_valid_moves(board, player)
+        if not valid_moves:
+            player = -player
+            valid_moves = game.get_valid_moves(board, player)
+            if not valid_moves:
+                break
+        board, player = OthelloGame.make_move(board, player, rng.choice(valid_moves)), -player
+    return OthelloGame.player_masks(board, player)
+
+
+@pytest.mark.parametrize("seed", range(12))
+def test_solver_matches_brute_force(seed):
+    own, opponent = endgame_position(seed, num_empties=7)
+    solver = EndgameSolver()
+    assert solver.solve(own, opponent) == brute_force(own, opponent)
+
+    move_scores = solver.solve_moves(own, opponent)
+    moves = valid_moves_mask(own, opponent)
+    assert sorted(move_scores) == [cell for cell in range(64) if moves & (1 << cell)]
+    for cell, score in move_scores.items():
+        move_mask = 1 << cell
+        flips = flips_for_move(own, opponent, move_mask)
+        assert score == -brute_force(opponent & ~flips, own | move_mask | flips)
+
+
+def test_move_scores_are_bounded_and_read_back_from_the_store(tmp_path):
+    store = EndgameStore(str(tmp_path / "endgame.sqlite"))
+    solver = EndgameSolver(store, max_move_scores=2)
+    positions = [endgame_position(seed, num_empties=6) for seed in range(4)]
+    solved = [solver.solve_moves(own, opponent) for own, opponent in positions]
+    assert len(solver.move_scores) == 2
+
+    # A new solver only reads the positions back from the store
+    reader = EndgameSolver(store)
+    assert [reader.solve_moves(own, opponent) for own, opponent in positions] == solved
+    assert reader.nodes == 0
+    store.close()
@@ -0,0 +1,68 @@
+import random
+
+import numpy as np
+import pytest
+
+from src.game.othello.othello_game import (
+    NUM_SYMMETRY_CLASSES, OthelloGame, canonical_board, flip_vertical, mirror_horizontal, symmetry_class, transpose
+)
+
+
+def random_board(seed, num_moves):
+    rng = random.Random(seed)
+    game = OthelloGame("")
+    board, player = game.board, game.player
+    for _ in range(num_moves):
+        valid_moves = game.get_valid_moves(board, player)
+        if not valid_moves:
+            break
+        board, player = OthelloGame.make_move(board, player, rng.choice(valid_moves)), -player
+    return board
+
+
+def symmetries(board):
+    """The 8 rotations and reflections of a board, each as a (bitboard, array transform) pair."""
+    transforms = []
+    for transposed, array_transposed in ((board, lambda a: a), (tuple(map(transpose, board)), np.transpose)):
+        flipped = tuple(map(flip_vertical, transposed))
+        transforms.extend([
+            (transposed, array_transposed),
+            (flipped, lambda a, t=array_transposed: np.flipud(t(a))),
+            (tuple(map(mirror_horizontal, transposed)), lambda a, t=array_transposed: np.fliplr(t(a))),
+            (tuple(map(mirror_horizontal, flipped)), lambda a, t=array_transposed: np.fliplr(np.flipud(t(a)))),
+        ])
+    return transforms
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_bit_transforms_match_array_transforms(seed):
+    game = OthelloGame("")
+    board = random_board(seed, num_moves=20)
+    for transformed, array_transform in symmetries(board):
+        assert np.array_equal(game.to_array(transformed), array_transform(game.to_array(board)))
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_canonical_board_is_shared_by_symmetries(seed):
+    board = random_board(seed, num_moves=20)
+    assert {canonical_board(transformed) for transformed, _ in symmetries(board)} == {canonical_board(board)}
+
+
+def test_symmetry_classes_are_invariant():
+    cells = np.arange(64).reshape((8, 8))
+    classes = np.vectorize(symmetry_class)(*np.divmod(cells, 8))
+    assert sorted(set(classes.flatten())) == list(range(NUM_SYMMETRY_CLASSES))
+    for _, array_transform in symmetries(OthelloGame("").board):
+        assert np.array_equal(array_transform(classes), classes)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_symmetric_weights_score_symmetries_the_same(monkeypatch, seed):
+    monkeypatch.setattr(OthelloGame, "SYMMETRIC", True)
+    np.random.seed(seed)
+    game = OthelloGame("")
+    assert len(game.get_weights()) == NUM_SYMMETRY_CLASSES
+
+    board = random_board(seed, num_moves=30)
+    scores = [game.evaluate_board(transformed, OthelloGame.BLACK) for transformed, _ in symmetries(board)]
+    assert scores == pytest.approx([scores[0]] * len(scores))
@@ -0,0 +1,66 @@
+import random
+
+import pytest
+
+from src.utility import ttt_extraction
+from src.utility.ttt_extraction import build_minimax_table, read_ttt_boards, solved_moves_and_scores
+from src.utility.ttt_states import load_states, state_board
+
+LINES = [(0, 1, 2), (3, 4, 5), (6, 7, 8), (0, 3, 6), (1, 4, 7), (2, 5, 8), (0, 4, 8), (2, 4, 6)]
+
+
+# Reference search on list boards, scored like the original minimax with X as the max player
+def winner(board):
+    for player in ("X", "O"):
+        if any(all(board[cell] == player for cell in line) for line in LINES):
+            return player
+    return None
+
+
+def empties(board):
+    return [cell for cell, spot in enumerate(board) if spot == " " or spot == ""]
+
+
+def reference_score(board, player):
+    other_player = "O" if player == "X" else "X"
+    if winner(board) == other_player:
+        score = len(empties(board)) + 1
+        return score if other_player == "X" else -score
+    elif not empties(board):
+        return 0
+
+    scores = [reference_score(board[:cell] + [player] + board[cell + 1:], other_player) for cell in empties(board)]
+    return max(scores) if player == "X" else min(scores)
+
+
+def reference_moves_and_scores(board):
+    if winner(board) == "O":
+        return {'position': None, 'score': -(len(empties(board)) + 1)}
+    elif not empties(board):
+        return {'position': None, 'score': 0}
+    return [(cell, reference_score(board[:cell] + ["X"] + board[cell + 1:], "O")) for cell in empties(board)]
+
+
+@pytest.fixture(autouse=True)
+def solved_table(monkeypatch):
+    # Solve the table again instead of reading whatever is in the cache directory
+    monkeypatch.setattr(ttt_extraction, "minimax_table", build_minimax_table())
+
+
+def test_table_matches_minimax_on_every_board():
+    boards = read_ttt_boards()
+    # The raw boards keep the neutral last cell of an unstripped csv line
+    boards += [state_board(row, raw=True) for row in range(len(load_states()))]
+    for board in boards:
+        assert solved_moves_and_scores(board) == reference_moves_and_scores(board), board
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_table_matches_minimax_on_random_boards(seed):
+    rng = random.Random(seed)
+    for _ in range(200):
+        # Any mix of symbols with X to move, including finished games and boards with both lines
+        board = [" "] * 9
+        for cell in rng.sample(range(9), rng.randrange(3, 10)):
+            board[cell] = rng.choice(["X", "O", "O "])
+        assert solved_moves_and_scores(board) == reference_moves_and_scores(board), board
@@ -10,7 +10,8 @@ from src.optimization.pso import PSO
 
 def train_engine():
     def train_for_one_generation():
-        genetic_algorithm = GeneticAlgorithm("chess", population_size=20, mutation_rate=0.8, seed=None)
+        # Evaluate the population on every core, the fixed chunk size keeps the results independent of the core count
+        genetic_algorithm = GeneticAlgorithm("chess", population_size=20, mutation_rate=0.8, seed=None, num_workers=os.cpu_count(), chunk_size=5)
         # Evolve the population for a certain number of generations
         best_individual = genetic_algorithm.evolve(generations=500)
         return best_individual.get_weights()